@@ -3,6 +3,15 @@
 # Wait for database to be ready
 python manage.py wait_for_db
 
-# Apply database migrations
-echo "Starting Celery worker"
-celery -A inventory_system worker --loglevel=info
\ No newline at end of file
+# CELERY_QUEUES picks the queues this worker consumes, e.g. "imports" or
+# "reports", so each group can get its own worker. By default one worker
+# consumes all of them. CELERY_BEAT=false leaves the schedule to another worker.
+QUEUES="${CELERY_QUEUES:-celery,imports,reports}"
+WORKER_NAME="${CELERY_WORKER_NAME:-worker}"
+BEAT_ARGS=""
+if [ "${CELERY_BEAT:-true}" = "true" ]; then
+    BEAT_ARGS="--beat --scheduler django_celery_beat.schedulers:DatabaseScheduler"
+fi
+
+echo "Starting Celery worker $WORKER_NAME for $QUEUES"
+exec celery -A inventory_system worker -Q "$QUEUES" -n "$WORKER_NAME@%h" $BEAT_ARGS --loglevel=info
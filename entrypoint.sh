@@ -7,6 +7,8 @@ python manage.py wait_for_db
 echo "Apply database migrations"
 python manage.py migrate
 
-# Start server
+# Start server. Workers, worker class and recycling come from
+# gunicorn.conf.py: GUNICORN_WORKER_CLASS=uvicorn (or SERVER_MODE=asgi) serves
+# the ASGI app, so requests waiting on the database do not hold a worker each.
 echo "Starting server"
-gunicorn inventory_system.wsgi:application --bind 0.0.0.0:$PORT
\ No newline at end of file
+exec gunicorn
\ No newline at end of file
@@ -0,0 +1,37 @@
+# Gunicorn settings, read from the environment. Gunicorn loads this file from
+# the working directory, so every `gunicorn` command in the image uses it.
+import multiprocessing
+import os
+
+# sync: one request per process, simplest and the default.
+# gthread: GUNICORN_THREADS requests per process, for I/O heavy traffic.
+# uvicorn: the ASGI app with async workers, the same as SERVER_MODE=asgi.
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'uvicorn': 'uvicorn.workers.UvicornWorker',
+}
+
+worker_type = os.environ.get('GUNICORN_WORKER_CLASS') or ('uvicorn' if os.environ.get('SERVER_MODE') == 'asgi' else 'sync')
+if worker_type not in WORKER_CLASSES:
+    raise RuntimeError(f"GUNICORN_WORKER_CLASS must be one of {', '.join(WORKER_CLASSES)}, not {worker_type!r}")
+
+worker_class = WORKER_CLASSES[worker_type]
+wsgi_app = 'inventory_system.asgi:application' if worker_type == 'uvicorn' else 'inventory_system.wsgi:application'
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+
+cpus = multiprocessing.cpu_count()
+# Sync workers block on the database, so run a few per core. Threads and the
+# event loop already overlap waiting requests, one process per core is enough.
+workers = int(os.environ.get('WEB_CONCURRENCY') or (cpus * 2 + 1 if worker_type == 'sync' else cpus))
+threads = int(os.environ.get('GUNICORN_THREADS', 4)) if worker_type == 'gthread' else 1
+
+# Recycle workers now and then so a slow leak can't grow forever. The jitter
+# keeps them from all restarting at the same moment.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Large exports stream for a while, don't kill a worker in the middle of one
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
@@ -0,0 +1,114 @@
+from functools import cached_property
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework import exceptions
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .authentication import ClaimsJWTAuthentication
+from .filters import CustomPagination, InventoryFilter, ProductFilter
+from .models import Inventory, Product
+from .serializers import InventorySerializer, ProductSerializer
+from .values import ValuesRepresentation
+
+# DRF views are synchronous, so these are plain Django async views that
+# return the same JSON as the DRF list and detail endpoints. Under an ASGI
+# server a request waiting on the database no longer holds a worker process.
+
+
+def error(detail, status, **headers):
+    response = JsonResponse({'detail': detail}, status=status)
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+def page_size(request):
+    try:
+        size = int(request.GET[CustomPagination.page_size_query_param])
+    except (KeyError, ValueError):
+        return CustomPagination.page_size
+    return min(size, CustomPagination.max_page_size) if size > 0 else CustomPagination.page_size
+
+
+class AsyncReadView:
+    """
+    Async list and detail views over the request user's rows of ``model``,
+    read with the async ORM as ``.values()`` rows and paginated like
+    ``CustomPagination``.
+    """
+    authenticator = ClaimsJWTAuthentication()
+
+    def __init__(self, model, serializer_class, filterset_class):
+        self.model = model
+        self.serializer_class = serializer_class
+        self.filterset_class = filterset_class
+
+    @cached_property
+    def representation(self):
+        return ValuesRepresentation(self.serializer_class())
+
+    async def authorize(self, request):
+        """
+        Return ``(user, None)`` for an authenticated GET, otherwise
+        ``(None, error response)``.
+        """
+        if request.method != 'GET':
+            return None, error(f'Method "{request.method}" not allowed.', 405, Allow='GET')
+        # The token check may hit the cache and the database, both sync
+        try:
+            result = await sync_to_async(self.authenticator.authenticate)(request)
+        except exceptions.AuthenticationFailed:
+            result = None
+        if not result:
+            return None, error(
+                'Authentication credentials were not provided or are invalid.', 401,
+                **{'WWW-Authenticate': self.authenticator.authenticate_header(request)},
+            )
+        return result[0], None
+
+    def get_queryset(self, user):
+        return self.model.objects.filter(user=user).order_by('created_at', 'id')
+
+    async def list(self, request):
+        user, rejected = await self.authorize(request)
+        if rejected:
+            return rejected
+        filterset = self.filterset_class(request.GET, queryset=self.get_queryset(user))
+        if not filterset.is_valid():
+            return JsonResponse(filterset.errors, status=400)
+        queryset = filterset.qs
+
+        size = page_size(request)
+        try:
+            number = int(request.GET.get('page', 1))
+        except ValueError:
+            number = 0
+        count = await queryset.acount()
+        if number < 1 or (number > 1 and (number - 1) * size >= count):
+            return error('Invalid page.', 404)
+
+        rows = queryset.values(*self.representation.lookups)[(number - 1) * size:number * size]
+        url = request.build_absolute_uri()
+        previous = None
+        if number > 1:
+            previous = remove_query_param(url, 'page') if number == 2 else replace_query_param(url, 'page', number - 1)
+        return JsonResponse({
+            'count': count,
+            'next': replace_query_param(url, 'page', number + 1) if number * size < count else None,
+            'previous': previous,
+            'results': [self.representation(row) async for row in rows],
+        })
+
+    async def detail(self, request, pk):
+        user, rejected = await self.authorize(request)
+        if rejected:
+            return rejected
+        row = await self.get_queryset(user).filter(pk=pk).values(*self.representation.lookups).afirst()
+        if row is None:
+            return error('Not found.', 404)
+        return JsonResponse(self.representation(row))
+
+
+products = AsyncReadView(Product, ProductSerializer, ProductFilter)
+inventory = AsyncReadView(Inventory, InventorySerializer, InventoryFilter)
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+
+def user_status_key(user_id):
+    return f'inventory:auth:{user_id}'
+
+
+def forget_user_status(user_id):
+    cache.delete(user_status_key(user_id))
+
+
+def get_user_status(user_id):
+    """
+    Return ``(is_active, username, email)`` for a user id, cached for
+    ``AUTH_USER_CACHE_TIMEOUT`` seconds. Deleted users are inactive. Saving
+    or deleting the user drops the cached value.
+    """
+    key = user_status_key(user_id)
+    status = cache.get(key)
+    if status is None:
+        row = User.objects.filter(pk=user_id).values_list('is_active', 'username', 'email').first()
+        status = row or (False, '', '')
+        cache.set(key, status, settings.AUTH_USER_CACHE_TIMEOUT)
+    return status
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds ``request.user`` from the token's user id
+    instead of loading the user row on every request.
+
+    The user is a ``User`` instance with only the id, username and email
+    set, which is all the views use: ``filter(user=request.user)``,
+    foreign key assignment and the notification address. Whether the user
+    still exists and is active comes from a short lived cache.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        is_active, username, email = get_user_status(user_id)
+        if not is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        user = User(pk=user_id, username=username, email=email)
+        user._state.adding = False
+        return user
@@ -0,0 +1,120 @@
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import invalidate_user_cache
+from .serializers import BulkDeleteSerializer
+from .signals import batched_deletes
+
+
+class BulkMixin:
+    """
+    List endpoints for creating (POST), updating (PUT) and deleting (DELETE)
+    many objects in one request. Each request is validated with set-based
+    queries and applied with a single bulk query inside one transaction.
+    The response reports a result for every item in the payload.
+    """
+    bulk_serializer_class = None
+
+    def get_bulk_serializer(self, data, partial=False):
+        return self.bulk_serializer_class(data=data, many=True, partial=partial, context=self.get_serializer_context())
+
+    def bulk_response(self, serializer, results):
+        results += [
+            {'index': index, 'status': 'error', 'errors': errors}
+            for index, errors in serializer.item_errors.items()
+        ]
+        results.sort(key=lambda result: result['index'])
+        invalidate_user_cache(self.request.user.pk)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    def bulk_create(self, request, *args, **kwargs):
+        serializer = self.get_bulk_serializer(request.data)
+        serializer.is_valid(raise_exception=True)
+
+        model = self.bulk_serializer_class.Meta.model
+        objects = [
+            model(user=request.user, **{field: value for field, value in data.items() if field != 'id'})
+            for data in serializer.validated_data
+        ]
+        try:
+            with transaction.atomic():
+                self.perform_bulk_create(objects)
+        except IntegrityError:
+            return self.bulk_conflict(request.data, serializer.valid_indexes)
+
+        # id is None on databases that do not return primary keys from bulk
+        # inserts (MySQL)
+        results = [
+            {'index': index, 'status': 'created', 'id': obj.pk}
+            for index, obj in zip(serializer.valid_indexes, objects)
+        ]
+        return self.bulk_response(serializer, results)
+
+    def bulk_conflict(self, data, valid_indexes):
+        """
+        A concurrent request wrote rows that clash with this batch after it
+        was validated, so nothing was created. Validate the batch again to
+        report the items that conflict now.
+        """
+        serializer = self.get_bulk_serializer(data)
+        serializer.is_valid()
+        results = [
+            {'index': index, 'status': 'error', 'errors': errors}
+            for index, errors in sorted(serializer.item_errors.items())
+            if index in valid_indexes
+        ]
+        return Response(
+            {'error': 'Some items conflict with concurrent changes, nothing was created.', 'results': results},
+            status=status.HTTP_409_CONFLICT,
+        )
+
+    def bulk_update(self, request, *args, **kwargs):
+        serializer = self.get_bulk_serializer(request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+
+        objects = []
+        fields = set()
+        now = timezone.now()
+        for data in serializer.validated_data:
+            obj = serializer.instances[data['id']]
+            for field, value in data.items():
+                if field != 'id':
+                    setattr(obj, field, value)
+                    fields.add(field)
+            obj.updated_at = now  # bulk_update does not apply auto_now
+            objects.append(obj)
+        if objects:
+            with transaction.atomic():
+                self.perform_bulk_update(objects, sorted(fields) + ['updated_at'])
+
+        results = [
+            {'index': index, 'status': 'updated', 'id': obj.pk}
+            for index, obj in zip(serializer.valid_indexes, objects)
+        ]
+        return self.bulk_response(serializer, results)
+
+    def perform_bulk_create(self, objects):
+        self.bulk_serializer_class.Meta.model.objects.bulk_create(objects)
+
+    def perform_bulk_update(self, objects, fields):
+        self.bulk_serializer_class.Meta.model.objects.bulk_update(objects, fields)
+
+    def bulk_destroy(self, request, *args, **kwargs):
+        serializer = BulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+
+        queryset = self.get_queryset().filter(pk__in=ids)
+        with transaction.atomic(), batched_deletes():
+            found = set(queryset.select_for_update().values_list('pk', flat=True))
+            queryset.model.objects.filter(pk__in=found).delete()
+
+        results = [
+            {'index': index, 'status': 'deleted', 'id': pk} if pk in found
+            else {'index': index, 'status': 'error', 'errors': {'id': ['Not found.']}}
+            for index, pk in enumerate(ids)
+        ]
+        invalidate_user_cache(request.user.pk)
+        return Response({'results': results}, status=status.HTTP_200_OK)
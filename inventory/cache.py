@@ -0,0 +1,86 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from .replica import pin_to_primary
+
+
+def user_version_key(user_id):
+    return f'inventory:version:{user_id}'
+
+
+def get_user_version(user_id):
+    """
+    Return the current cache version of a user's data. Every list response
+    is cached under this version, so bumping it invalidates all of them at
+    once without scanning for keys.
+    """
+    key = user_version_key(user_id)
+    # Seed from the clock rather than 1, so that if the version key is
+    # evicted we never fall back to a version that still has entries.
+    cache.add(key, time.time_ns(), timeout=None)
+    return cache.get(key)
+
+
+def bump_user_version(user_id):
+    key = user_version_key(user_id)
+    cache.add(key, time.time_ns(), timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:  # evicted between add() and incr()
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def invalidate_user_cache(user_id):
+    """
+    Bump the user's cache version once the current transaction commits, so a
+    concurrent request cannot cache data from before the write. The user's
+    reads also stick to the primary database for a while after it.
+    """
+    def committed():
+        bump_user_version(user_id)
+        pin_to_primary(user_id)
+
+    transaction.on_commit(committed)
+
+
+def list_cache_key(request, kind='list', exclude=()):
+    params = urlencode(sorted(item for item in request.query_params.lists() if item[0] not in exclude), doseq=True)
+    digest = hashlib.md5(f'{request.get_host()}{request.path}?{params}'.encode()).hexdigest()
+    return f'inventory:{kind}:{request.user.pk}:{get_user_version(request.user.pk)}:{digest}'
+
+
+class CachedListMixin:
+    """
+    Read-through cache for list responses keyed on the user, the endpoint and
+    its query parameters (filters and page). Updates and deletes bump the
+    user's cache version; viewsets call invalidate_user_cache from their own
+    perform_create.
+    """
+
+    def list(self, request, *args, **kwargs):
+        key = list_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, self.list_cache_timeout())
+        return response
+
+    def list_cache_timeout(self):
+        return settings.LIST_CACHE_TIMEOUT
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidate_user_cache(self.request.user.pk)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        invalidate_user_cache(self.request.user.pk)
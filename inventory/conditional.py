@@ -0,0 +1,82 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from .cache import list_cache_key
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Answer repeat GETs with 304 Not Modified.
+
+    List validators come from a single MAX(updated_at), COUNT(*) aggregate
+    over the filtered queryset, cached per user version like the list
+    itself, so an unchanged collection is never serialized. Collections are only revalidated by ETag: Last-Modified is
+    sent, but it cannot reflect deletions, so If-Modified-Since alone never
+    yields a 304 for a list.
+
+    Cursor pages skip the aggregate, which would scan the whole collection
+    cursor pagination exists to avoid; their ETag hashes the page itself.
+    """
+
+    pagination_params = ('page', 'page_size', 'cursor', 'pagination')
+
+    def get_collection_state(self, request):
+        # Cached next to the list response and invalidated with it. The state
+        # covers the whole filtered collection, so every page shares one entry.
+        key = list_cache_key(request, kind='state', exclude=self.pagination_params)
+        state = cache.get(key)
+        if state is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            state = queryset.order_by().aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+            cache.set(key, state, self.list_cache_timeout())
+        return state
+
+    def list(self, request, *args, **kwargs):
+        params = urlencode(sorted(request.query_params.lists()), doseq=True)
+        if isinstance(self.paginator, CursorPagination):
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            etag = make_etag(request.path, params, response.data)
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return set_validators(not_modified, etag, None)
+            return set_validators(response, etag, None)
+
+        state = self.get_collection_state(request)
+        etag = make_etag(request.path, params, state['last_modified'], state['count'])
+
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return set_validators(not_modified, etag, state['last_modified'])
+        response = super().list(request, *args, **kwargs)
+        return set_validators(response, etag, state['last_modified'])
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = make_etag(request.path, instance.pk, instance.updated_at)
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=int(instance.updated_at.timestamp()))
+        if not_modified is not None:
+            return set_validators(not_modified, etag, instance.updated_at)
+        serializer = self.get_serializer(instance)
+        return set_validators(Response(serializer.data), etag, instance.updated_at)
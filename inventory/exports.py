@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+
+from .models import Product
+from .replica import read_database
+
+CATALOG_FIELDS = ['id', 'name', 'description', 'price', 'supplier', 'reorder_level', 'created_at', 'updated_at']
+CATALOG_RELATED_FIELDS = {
+    'supplier_name': F('supplier__name'),
+    'quantity': F('inventory__quantity'),
+    'reserved': F('inventory__reserved'),
+    'low_stock': F('inventory__low_stock'),
+    'inventory_updated_at': F('inventory__updated_at'),
+}
+
+
+def iterate_by_pk(queryset, chunk_size):
+    """
+    Yield the rows of a values() queryset in primary key order, fetching
+    ``chunk_size`` rows per query.
+
+    Each chunk starts after the last primary key of the previous one, so
+    memory stays constant on every backend. The MySQL driver would buffer
+    the whole result of a single ``.iterator()`` query on the client.
+    """
+    queryset = queryset.order_by('pk')
+    last = None
+    while True:
+        chunk = queryset if last is None else queryset.filter(pk__gt=last)
+        rows = list(chunk[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]['id']
+
+
+def catalog_rows(user, updated_since=None):
+    """
+    Yield the user's products joined with their inventory as plain dicts.
+    With ``updated_since`` only products whose product or inventory row
+    changed at or after that time are included. Read from the replica when
+    the user has not written recently.
+    """
+    queryset = Product.objects.using(read_database(user.pk)).filter(user=user)
+    if updated_since is not None:
+        queryset = queryset.filter(Q(updated_at__gte=updated_since) | Q(inventory__updated_at__gte=updated_since))
+    return iterate_by_pk(queryset.values(*CATALOG_FIELDS, **CATALOG_RELATED_FIELDS), settings.EXPORT_CHUNK_SIZE)
+
+
+def ndjson_lines(rows, chunk_size):
+    """
+    Encode rows as newline delimited JSON, yielding ``chunk_size`` lines at a
+    time.
+    """
+    encoder = DjangoJSONEncoder()
+    lines = []
+    for row in rows:
+        lines.append(encoder.encode(row) + '\n')
+        if len(lines) >= chunk_size:
+            yield ''.join(lines).encode()
+            lines = []
+    if lines:
+        yield ''.join(lines).encode()
@@ -1,14 +1,19 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from django_filters import rest_framework as filters
 from .models import Product, Supplier, Inventory
+from .search import search_products
 
 
 class ProductFilter(filters.FilterSet):
     name = filters.CharFilter(lookup_expr='icontains')  # Case-insensitive partial match
+    search = filters.CharFilter(method='filter_search')  # Full-text search, most relevant first
 
     class Meta:
         model = Product
-        fields = ['name', 'price']  # Fields to filter by
+        fields = ['name', 'price', 'search']  # Fields to filter by
+
+    def filter_search(self, queryset, name, value):
+        return search_products(queryset, value)
 
 class SupplierFilter(filters.FilterSet):
     name = filters.CharFilter(lookup_expr='icontains')  # Case-insensitive partial match
@@ -27,4 +32,15 @@ class InventoryFilter(filters.FilterSet):
 class CustomPagination(PageNumberPagination):
     page_size = 10  # Items per page
     page_size_query_param = 'page_size'  # Allow client to override page size
-    max_page_size = 100  # Maximum page size
\ No newline at end of file
+    max_page_size = 100  # Maximum page size
+
+class CustomCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the indexed (user, updated_at, id) columns. Every
+    page costs the same however deep the client walks, and no COUNT query is
+    run. Selected per request with ?pagination=cursor.
+    """
+    ordering = ('updated_at', 'id')
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
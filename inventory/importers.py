@@ -0,0 +1,372 @@
+import codecs
+import csv
+import io
+import logging
+import tempfile
+import uuid
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .cache import invalidate_user_cache
+from .models import Inventory, Product, Supplier
+from .stats import StatsDelta, create_supplier_stats
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ('name', 'description', 'price', 'supplier')
+IMPORT_BATCH_SIZE = 1000
+
+
+def read_csv_header(file):
+    """
+    Return the column names of an uploaded CSV file, reading only as many
+    chunks as it takes to reach the end of the header line.
+    """
+    head = b''
+    for chunk in file.chunks():
+        head += chunk
+        if b'\n' in head:
+            break
+    file.seek(0)
+    line = head.split(b'\n', 1)[0].decode('utf-8-sig')
+    return next(csv.reader([line]), [])
+
+
+def save_upload(file):
+    """
+    Spool an uploaded CSV file to storage and return the storage name the
+    import task should read it back from, along with its number of rows.
+
+    The rows are counted while the file is copied, so the job has its total
+    before the import starts. The count is None for a file that does not
+    parse, the import reports that error.
+    """
+    with tempfile.TemporaryFile() as spool:
+        def copied_lines():
+            for line in file:
+                spool.write(line)
+                yield line
+
+        lines = copied_lines()
+        try:
+            # Blank lines are skipped by the importer, the header is not a row
+            rows = csv.reader(codecs.iterdecode(lines, 'utf-8-sig'))
+            row_count = max(sum(1 for row in rows if row) - 1, 0)
+        except (UnicodeDecodeError, csv.Error):
+            row_count = None
+            for _ in lines:
+                pass
+        spool.seek(0)
+        name = default_storage.save(f"{settings.CSV_IMPORT_DIR}/{uuid.uuid4().hex}.csv", File(spool))
+    return name, row_count
+
+
+def iter_csv_rows(name):
+    """
+    Yield the rows of a spooled CSV file as dicts, decoding it line by line so
+    memory use does not depend on the file size.
+    """
+    with default_storage.open(name, 'rb') as file:
+        yield from csv.DictReader(codecs.iterdecode(file, 'utf-8-sig'))
+
+
+def split_csv(name, rows_per_shard):
+    """
+    Split a spooled CSV file into shard files of at most ``rows_per_shard``
+    rows, each starting with the original header.
+
+    Rows are copied verbatim in a single pass, blank lines are dropped like
+    csv.DictReader drops them. Returns the storage names of
+    the shards, the set of supplier names seen (so the caller can create the
+    suppliers once before the shards are imported in parallel) and the number
+    of rows.
+    """
+    shard_names = []
+    supplier_names = set()
+    row_count = 0
+    with default_storage.open(name, 'rb') as file:
+        reader = csv.reader(codecs.iterdecode(file, 'utf-8-sig'))
+        header = next(reader, None)
+        if header is None:
+            return shard_names, supplier_names, row_count
+        supplier_index = header.index('supplier') if 'supplier' in header else None
+
+        for rows in chunked((row for row in reader if row), rows_per_shard):
+            with tempfile.TemporaryFile() as shard:
+                text = io.TextIOWrapper(shard, encoding='utf-8', newline='')
+                writer = csv.writer(text)
+                writer.writerow(header)
+                writer.writerows(rows)
+                text.flush()
+                shard.seek(0)
+                shard_name = f"{settings.CSV_IMPORT_DIR}/{uuid.uuid4().hex}.csv"
+                shard_names.append(default_storage.save(shard_name, File(shard)))
+                text.detach()
+            row_count += len(rows)
+            if supplier_index is not None:
+                supplier_names.update(row[supplier_index] for row in rows if len(row) > supplier_index)
+    return shard_names, supplier_names, row_count
+
+
+def chunked(iterable, size):
+    """
+    Yield lists of at most ``size`` items from ``iterable``.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ProductImporter:
+    """
+    Import CSV product rows for a single user in batches.
+
+    Each batch resolves its suppliers with one lookup (bulk creating the
+    missing ones) and writes its products with a single ``bulk_create`` inside
+    its own transaction. If a batch is rejected by the database it is retried
+    row by row so that only the offending rows are reported as errors.
+
+    In ``upsert`` mode rows are matched to existing products on the natural
+    key (user, supplier, name) with one lookup per batch. Matches whose price
+    or description changed are written with ``bulk_update``, unchanged ones
+    are skipped and only the remaining rows are inserted, so re-importing a
+    full catalog costs roughly the size of the delta.
+    """
+
+    UPSERT_FIELDS = ['price', 'description', 'updated_at']
+
+    def __init__(self, user, batch_size=IMPORT_BATCH_SIZE, job=None, upsert=False):
+        self.user = user
+        self.batch_size = batch_size
+        self.job = job
+        self.upsert = upsert
+        self.success_count = 0
+        self.created_count = 0
+        self.updated_count = 0
+        self.errors = []
+        self._suppliers = {}  # supplier name -> Supplier, shared across batches
+
+    def run(self, rows):
+        for chunk in chunked(rows, self.batch_size):
+            done, failed = self.success_count, len(self.errors)
+            self.import_chunk(chunk)
+            if self.success_count > done:
+                invalidate_user_cache(self.user.pk)
+            if self.job is not None:
+                # One counter update per batch rather than per row
+                self.job.add_progress(self.success_count - done, len(self.errors) - failed)
+        return self.success_count, self.errors
+
+    def import_chunk(self, rows):
+        cleaned = []
+        for row in rows:
+            if any(row.get(key) is None for key in REQUIRED_COLUMNS):
+                self.add_error(f"Missing required fields in row: {row}")
+                continue
+            try:
+                cleaned.append((row, self.clean_row(row)))
+            except ValidationError as e:
+                self.add_error(f"Error processing row {row}: {'; '.join(e.messages)}")
+        if not cleaned:
+            return
+
+        self.resolve_suppliers({data['supplier'] for _, data in cleaned})
+        with transaction.atomic():
+            if self.upsert:
+                self.lock_suppliers(cleaned)
+            pending = self.plan_writes(cleaned)
+            try:
+                created, updated = self.write_batch(pending)
+            except DatabaseError as e:
+                self.write_rows_individually(cleaned, pending, e)
+                return
+        self.success_count += len(cleaned)
+        self.created_count += len(created)
+        self.updated_count += len(updated)
+
+    def write_batch(self, pending):
+        created = [product for _, product, is_new in pending if is_new]
+        updated = [product for _, product, is_new in pending if not is_new]
+        with transaction.atomic():
+            Product.objects.bulk_create(created)
+            if updated:
+                Product.objects.bulk_update(updated, self.UPSERT_FIELDS)
+            self.update_stats(created, updated)
+        return created, updated
+
+    def lock_suppliers(self, cleaned):
+        """
+        Lock the batch's suppliers until it is written. Parallel shards and
+        imports upserting products of the same supplier then take turns, and
+        each one finds the products the others inserted instead of adding them
+        a second time.
+        """
+        supplier_ids = {self._suppliers[data['supplier']].pk for _, data in cleaned}
+        list(Supplier.objects.select_for_update().filter(pk__in=supplier_ids).order_by('pk').values_list('pk', flat=True))
+
+    def plan_writes(self, cleaned):
+        """
+        Return the (row, product, is_new) triples a batch needs to write: new
+        products to insert and, in upsert mode, existing products whose values
+        changed.
+        """
+        if not self.upsert:
+            return [(row, self.build_product(data), True) for row, data in cleaned]
+
+        existing = self.find_existing(cleaned)
+        self._previous_prices = {}  # product id -> price before this batch
+        pending = {}  # id(product) -> (row, product), so each product is written once
+        now = timezone.now()
+        for row, data in cleaned:
+            key = self.natural_key(self._suppliers[data['supplier']].pk, data['name'])
+            if key not in existing:
+                # Later rows with the same key in this batch update this product
+                product = self.build_product(data)
+                existing[key] = [product]
+                pending[id(product)] = (row, product, True)
+                continue
+            for product in existing[key]:
+                if product.price == data['price'] and product.description == data['description']:
+                    continue
+                if product.pk is not None:
+                    self._previous_prices.setdefault(product.pk, product.price)
+                product.price = data['price']
+                product.description = data['description']
+                product.updated_at = now  # bulk_update does not apply auto_now
+                pending[id(product)] = (row, product, product.pk is None)
+        return list(pending.values())
+
+    def update_stats(self, created, updated):
+        """
+        Apply a written batch to the supplier stats: count the new products and
+        revalue the stock of products whose price changed. Rows written one by
+        one in the fallback path are covered by the model signals instead.
+        """
+        stats = StatsDelta()
+        for product in created:
+            stats.add_products(product.supplier_id, 1)
+        repriced = {product.pk: product for product in updated if product.price != self._previous_prices[product.pk]}
+        if repriced:
+            quantities = Inventory.objects.filter(product_id__in=repriced).values_list('product_id', 'quantity')
+            for product_id, quantity in quantities:
+                product = repriced[product_id]
+                stats.add_stock(product.supplier_id, self._previous_prices[product_id], product.reorder_level, quantity, sign=-1)
+                stats.add_stock(product.supplier_id, product.price, product.reorder_level, quantity)
+        stats.apply()
+
+    def find_existing(self, cleaned):
+        """
+        Fetch the user's products matching the batch's (supplier, name) keys
+        in a single query.
+        """
+        supplier_ids = {self._suppliers[data['supplier']].pk for _, data in cleaned}
+        names = {data['name'] for _, data in cleaned}
+        existing = {}
+        products = Product.objects.filter(user=self.user, supplier_id__in=supplier_ids, name__in=names)
+        for product in products.order_by('id'):
+            existing.setdefault(self.natural_key(product.supplier_id, product.name), []).append(product)
+        return existing
+
+    @staticmethod
+    def natural_key(supplier_id, name):
+        # MySQL's default collation matches name__in case-insensitively, so
+        # compare names the same way
+        return supplier_id, name.casefold()
+
+    def write_rows_individually(self, cleaned, pending, error):
+        logger.warning(f"Batch write failed, retrying {len(pending)} rows individually: {error}")
+        failed_rows = set()
+        for row, product, is_new in pending:
+            try:
+                with transaction.atomic():
+                    if is_new:
+                        # Undo any primary key set by the rolled back bulk insert
+                        product.pk = None
+                        product._state.adding = True
+                    product.save()
+                if is_new:
+                    self.created_count += 1
+                else:
+                    self.updated_count += 1
+            except DatabaseError as e:
+                failed_rows.add(id(row))
+                self.add_error(f"Error processing row {row}: {e}")
+        self.success_count += sum(1 for row, _ in cleaned if id(row) not in failed_rows)
+
+    def clean_row(self, row):
+        """
+        Validate a CSV row and return the values used to build its product.
+        """
+        return {
+            'name': Product._meta.get_field('name').clean(row['name'], None),
+            'description': row['description'],
+            'price': Product._meta.get_field('price').clean(row['price'], None),
+            'supplier': Supplier._meta.get_field('name').clean(row['supplier'], None),
+        }
+
+    def prefetch_suppliers(self, names):
+        """
+        Resolve an arbitrarily large set of supplier names up front, skipping
+        names that would fail validation for their rows anyway.
+        """
+        field = Supplier._meta.get_field('name')
+        valid = []
+        for name in names:
+            try:
+                valid.append(field.clean(name, None))
+            except ValidationError:
+                continue
+        for batch in chunked(sorted(valid), self.batch_size):
+            self.resolve_suppliers(set(batch))
+
+    def resolve_suppliers(self, names):
+        """
+        Make sure every supplier name in ``names`` is cached, creating the
+        missing suppliers with one bulk insert.
+        """
+        missing = names - self._suppliers.keys()
+        if not missing:
+            return
+        self._cache_suppliers(missing)
+        missing -= self._suppliers.keys()
+        if missing:
+            with transaction.atomic():
+                Supplier.objects.bulk_create(
+                    [Supplier(name=name, contact_info='', user=self.user) for name in missing]
+                )
+                # MySQL does not return primary keys from bulk_create, so read them back
+                self._cache_suppliers(missing)
+                create_supplier_stats(self._suppliers[name] for name in missing if name in self._suppliers)
+
+    def _cache_suppliers(self, names):
+        exact, folded = {}, {}
+        for supplier in Supplier.objects.filter(user=self.user, name__in=names).order_by('id'):
+            exact.setdefault(supplier.name, supplier)
+            folded.setdefault(supplier.name.casefold(), supplier)
+        # MySQL's default collation matches case-insensitively, like get_or_create did
+        for name in names:
+            supplier = exact.get(name) or folded.get(name.casefold())
+            if supplier is not None:
+                self._suppliers[name] = supplier
+
+    def build_product(self, data):
+        return Product(
+            name=data['name'],
+            description=data['description'],
+            price=data['price'],
+            supplier=self._suppliers[data['supplier']],
+            user=self.user,
+        )
+
+    def add_error(self, message):
+        self.errors.append(message)
+        logger.error(message)
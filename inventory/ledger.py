@@ -0,0 +1,107 @@
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .importers import chunked
+from .models import Inventory, StockMovement, StockSnapshot
+
+LEDGER_BATCH_SIZE = 1000
+
+
+def record_movements(changes, reason):
+    """
+    Append a movement for every (inventory id, delta) pair in ``changes``
+    with batched inserts. Zero deltas are skipped. Call this in the same
+    transaction as the quantity change it records.
+    """
+    movements = [
+        StockMovement(inventory_id=inventory_id, delta=delta, reason=reason)
+        for inventory_id, delta in changes
+        if delta
+    ]
+    StockMovement.objects.bulk_create(movements, batch_size=LEDGER_BATCH_SIZE)
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def daily_totals(day):
+    movements = StockMovement.objects.filter(
+        created_at__gte=start_of_day(day),
+        created_at__lt=start_of_day(day + timedelta(days=1)),
+    )
+    return dict(movements.values_list('inventory').annotate(total=Sum('delta')).order_by())
+
+
+def latest_snapshots(inventories, before):
+    """
+    Return {inventory id: quantity} from the latest snapshot of each
+    inventory in ``inventories`` dated before ``before``.
+    """
+    latest = StockSnapshot.objects.filter(inventory=OuterRef('pk'), date__lt=before).order_by('-date')
+    levels = inventories.annotate(snapshot=Subquery(latest.values('quantity')[:1])).exclude(snapshot=None)
+    return dict(levels.values_list('pk', 'snapshot').order_by())
+
+
+def compact_movements(until=None, batch_size=LEDGER_BATCH_SIZE):
+    """
+    Write a snapshot for every inventory and every complete day (before
+    ``until``, today by default) that had movements since the last run.
+
+    Days are compacted in order, each in its own transaction, so every day up
+    to the latest snapshot date is always fully compacted. Days without
+    movements are skipped. Returns the number of snapshots written.
+    """
+    until = until or timezone.localdate()
+    last = StockSnapshot.objects.aggregate(last=Max('date'))['last']
+    since = start_of_day(last + timedelta(days=1)) if last else None
+    levels = {}  # running quantities of the inventories seen so far
+    written = 0
+    while True:
+        pending = StockMovement.objects.filter(created_at__lt=start_of_day(until))
+        if since is not None:
+            pending = pending.filter(created_at__gte=since)
+        first = pending.order_by('created_at').values_list('created_at', flat=True).first()
+        if first is None:
+            return written
+
+        day = timezone.localdate(first)
+        totals = daily_totals(day)
+        unseen = sorted(totals.keys() - levels.keys())
+        for ids in chunked(unseen, batch_size):
+            levels.update(latest_snapshots(Inventory.objects.filter(pk__in=ids), day))
+
+        snapshots = []
+        for inventory_id, total in totals.items():
+            levels[inventory_id] = levels.get(inventory_id, 0) + total
+            snapshots.append(StockSnapshot(inventory_id=inventory_id, date=day, quantity=levels[inventory_id]))
+        with transaction.atomic():
+            StockSnapshot.objects.bulk_create(snapshots, batch_size=batch_size, ignore_conflicts=True)
+        written += len(snapshots)
+        since = start_of_day(day + timedelta(days=1))
+
+
+def stock_levels_at(inventories, when):
+    """
+    Return {inventory id: quantity} at ``when`` for the inventories in the
+    ``inventories`` queryset; inventories without movements by then are left
+    out.
+
+    Each level is the inventory's latest compacted snapshot plus the sum of
+    its movements since, so only the uncompacted tail of the ledger is read.
+    """
+    day = timezone.localdate(when)
+    # Every day up to the latest snapshot date has been compacted, so no
+    # movement between an inventory's own latest snapshot and this date exists
+    last = StockSnapshot.objects.filter(date__lt=day).aggregate(last=Max('date'))['last']
+    levels = {}
+    tail = StockMovement.objects.filter(inventory__in=inventories, created_at__lte=when)
+    if last is not None:
+        levels = latest_snapshots(inventories, last + timedelta(days=1))
+        tail = tail.filter(created_at__gte=start_of_day(last + timedelta(days=1)))
+    for inventory_id, total in tail.values_list('inventory').annotate(total=Sum('delta')).order_by():
+        levels[inventory_id] = levels.get(inventory_id, 0) + total
+    return levels
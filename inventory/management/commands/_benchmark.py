@@ -0,0 +1,94 @@
+"""
+Helpers shared by the benchmark_* management commands.
+
+The commands seed their data for a dedicated benchmark user in the configured
+database, so run them against a scratch database rather than production.
+"""
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+
+from inventory.importers import chunked
+from inventory.models import Inventory, Product, Supplier
+
+BENCHMARK_EMAIL = 'benchmark@example.com'
+
+WORDS = [
+    'steel', 'cotton', 'organic', 'lamp', 'wooden', 'chair', 'table', 'premium', 'compact', 'wireless',
+    'ceramic', 'bottle', 'leather', 'wallet', 'garden', 'hose', 'kitchen', 'knife', 'desk', 'cable',
+    'travel', 'mug', 'solar', 'charger', 'bamboo', 'towel', 'glass', 'vase', 'running', 'shoe',
+]
+
+
+def get_benchmark_user():
+    user, _ = User.objects.get_or_create(
+        username=BENCHMARK_EMAIL, defaults={'email': BENCHMARK_EMAIL}
+    )
+    return user
+
+
+def seed_catalog(user, rows, batch_size=10000, stdout=None):
+    """
+    Top up ``user``'s catalog to ``rows`` products, each with an inventory row.
+    """
+    existing = Product.objects.filter(user=user).count()
+    if existing >= rows:
+        return
+    if stdout:
+        stdout.write(f'Seeding {rows - existing} products...')
+
+    rng = random.Random(existing)
+    suppliers = [
+        Supplier.objects.get_or_create(name=f'Benchmark Supplier {i}', user=user, defaults={'contact_info': ''})[0]
+        for i in range(20)
+    ]
+    for batch in chunked(range(existing, rows), batch_size):
+        Product.objects.bulk_create(
+            Product(
+                name=' '.join(rng.sample(WORDS, 3)) + f' {i}',
+                description=' '.join(rng.choices(WORDS, k=12)),
+                price=rng.randint(100, 100000) / 100,
+                supplier=rng.choice(suppliers),
+                user=user,
+            )
+            for i in batch
+        )
+    # Read the new ids back, MySQL does not return them from bulk_create
+    products = (
+        Product.objects.filter(user=user, inventory__isnull=True)
+        .values_list('id', flat=True)
+        .iterator(chunk_size=batch_size)
+    )
+    for batch in chunked(products, batch_size):
+        Inventory.objects.bulk_create(
+            Inventory(product_id=product_id, quantity=rng.randint(0, 200), user=user) for product_id in batch
+        )
+
+
+def measure(func, repeat):
+    """
+    Call ``func`` once to warm up, then ``repeat`` times, returning the
+    elapsed wall clock time of each call in milliseconds.
+    """
+    func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(samples):
+    return (
+        f"p50 {percentile(samples, 50):8.2f} ms  "
+        f"p99 {percentile(samples, 99):8.2f} ms  "
+        f"mean {statistics.mean(samples):8.2f} ms"
+    )
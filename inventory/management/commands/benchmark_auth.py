@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from inventory.authentication import ClaimsJWTAuthentication
+from inventory.views import ProductViewSet
+
+from ._benchmark import get_benchmark_user, seed_catalog
+
+
+class Command(BaseCommand):
+    """Django command to compare JWT authentication classes on a list endpoint"""
+
+    help = 'Measure requests/sec of the product list with the database and claims based JWT authentication.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Products to seed for the benchmark user.')
+        parser.add_argument('--requests', type=int, default=2000, help='Timed requests per authentication class.')
+
+    def handle(self, *args, **options):
+        user = get_benchmark_user()
+        seed_catalog(user, options['rows'], stdout=self.stdout)
+        factory = APIRequestFactory()
+        authorization = f'Bearer {AccessToken.for_user(user)}'
+
+        for label, authentication_class in [
+            ('JWTAuthentication', JWTAuthentication),
+            ('ClaimsJWTAuthentication', ClaimsJWTAuthentication),
+        ]:
+            view = ProductViewSet.as_view({'get': 'list'}, authentication_classes=[authentication_class])
+
+            def request():
+                response = view(factory.get('/api/products/', SERVER_NAME='localhost', HTTP_AUTHORIZATION=authorization))
+                assert response.status_code == 200, response.status_code
+                response.render()
+
+            # Warm up the list and user caches, then count one steady-state request
+            request()
+            with CaptureQueriesContext(connection) as queries:
+                request()
+
+            start = time.perf_counter()
+            for _ in range(options['requests']):
+                request()
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{label:24} {options["requests"] / elapsed:8.0f} requests/sec  '
+                f'{len(queries)} queries/request'
+            )
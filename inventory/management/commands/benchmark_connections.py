@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from inventory.models import Product
+
+from ._benchmark import get_benchmark_user, measure, seed_catalog, summarize
+
+
+class Command(BaseCommand):
+    """Django command to compare new and persistent database connections"""
+
+    help = 'Measure request latency with a new database connection per request and with persistent connections.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Timed requests per mode.')
+        parser.add_argument('--max-age', type=int, default=60, help='CONN_MAX_AGE of the persistent mode.')
+
+    def handle(self, *args, **options):
+        user = get_benchmark_user()
+        seed_catalog(user, 100, stdout=self.stdout)
+        settings_dict = connection.settings_dict
+        original = settings_dict['CONN_MAX_AGE'], settings_dict['CONN_HEALTH_CHECKS']
+
+        def request():
+            # Django runs close_old_connections() when a request starts and
+            # when it finishes, which is what decides whether a connection is
+            # kept for the next one. Celery does the same around tasks.
+            close_old_connections()
+            list(Product.objects.filter(user=user).order_by('id').values_list('id', 'name')[:10])
+            close_old_connections()
+
+        try:
+            for label, max_age, health_checks in [
+                ('new connection per request', 0, False),
+                (f'persistent ({options["max_age"]}s, health checks)', options['max_age'], True),
+            ]:
+                settings_dict['CONN_MAX_AGE'], settings_dict['CONN_HEALTH_CHECKS'] = max_age, health_checks
+                connection.close()
+                samples = measure(request, options['requests'])
+                self.stdout.write(f'{label:<40} {summarize(samples)}')
+        finally:
+            settings_dict['CONN_MAX_AGE'], settings_dict['CONN_HEALTH_CHECKS'] = original
+            connection.close()
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from inventory.filters import ProductFilter
+from inventory.models import Product
+
+from ._benchmark import get_benchmark_user, measure, seed_catalog, summarize
+
+
+class Command(BaseCommand):
+    """Django command to compare the name filter with full-text product search"""
+
+    help = 'Compare ?name= (icontains) and ?search= (full-text) product list latency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('terms', nargs='*', default=['lamp', 'organic cotton', 'wireless charger'])
+        parser.add_argument('--rows', type=int, default=1000000, help='Products to seed for the benchmark user.')
+        parser.add_argument('--repeat', type=int, default=10, help='Timed runs per query.')
+
+    def handle(self, *args, **options):
+        user = get_benchmark_user()
+        seed_catalog(user, options['rows'], stdout=self.stdout)
+        products = Product.objects.filter(user=user).order_by('created_at', 'id')
+
+        for term in options['terms']:
+            self.stdout.write(f'"{term}" over {options["rows"]} products')
+            for param in ('name', 'search'):
+                queryset = ProductFilter({param: term}, queryset=products).qs
+                # A list request runs the page COUNT and fetches the first page
+                samples = measure(lambda: (queryset.count(), list(queryset[:10])), options['repeat'])
+                label = f'?{param}={term}'
+                self.stdout.write(f'  {label:<32} {summarize(samples)}')
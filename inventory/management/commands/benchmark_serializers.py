@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from inventory.models import Inventory, Product, Supplier
+from inventory.serializers import InventorySerializer, ProductSerializer, SupplierSerializer
+from inventory.values import ValuesRepresentation
+
+from ._benchmark import get_benchmark_user, measure, percentile, seed_catalog
+
+
+def values_page(serializer_class, queryset, size):
+    # The fields are inspected once per request, as ValuesListMixin does
+    representation = ValuesRepresentation(serializer_class())
+    return [representation(row) for row in queryset.values(*representation.lookups)[:size]]
+
+
+class Command(BaseCommand):
+    """Django command to compare the serializer and .values() list paths"""
+
+    help = 'Compare the per-item cost of ModelSerializer and .values() list pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Products to seed for the benchmark user.')
+        parser.add_argument('--page-size', type=int, default=100, help='Items per list page.')
+        parser.add_argument('--repeat', type=int, default=50, help='Timed runs per page.')
+
+    def handle(self, *args, **options):
+        user = get_benchmark_user()
+        seed_catalog(user, options['rows'], stdout=self.stdout)
+        size = options['page_size']
+
+        for label, serializer_class, queryset in [
+            ('products', ProductSerializer, Product.objects.filter(user=user).order_by('created_at', 'id')),
+            ('suppliers', SupplierSerializer, Supplier.objects.filter(user=user).order_by('created_at', 'id')),
+            ('inventory', InventorySerializer, Inventory.objects.filter(user=user).order_by('created_at', 'id')),
+        ]:
+            page = queryset[:size]
+            items = len(page)
+            # Both paths include fetching the page, as a list request does
+            serializer = measure(lambda: serializer_class(list(page.all()), many=True).data, options['repeat'])
+            values = measure(lambda: values_page(serializer_class, queryset, size), options['repeat'])
+            serializer_ms, values_ms = percentile(serializer, 50), percentile(values, 50)
+            self.stdout.write(f'{label} ({items} items per page)')
+            self.stdout.write(f'  serializer {serializer_ms * 1000 / items:8.1f} us/item (p50)  {serializer_ms:8.2f} ms/page')
+            self.stdout.write(f'  values()   {values_ms * 1000 / items:8.1f} us/item (p50)  {values_ms:8.2f} ms/page')
+            self.stdout.write(f'  speedup    {serializer_ms / values_ms:8.1f}x')
@@ -0,0 +1,73 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ._benchmark import get_benchmark_user, percentile, seed_catalog
+
+
+def run_load(url, headers, concurrency, duration):
+    """
+    Keep ``concurrency`` connections busy requesting ``url`` for ``duration``
+    seconds. Returns the latencies in milliseconds and the number of errors.
+    """
+    deadline = time.perf_counter() + duration
+    lock = threading.Lock()
+    latencies, errors = [], [0]
+
+    def worker():
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                ok = session.get(url, headers=headers, timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return latencies, errors[0]
+
+
+class Command(BaseCommand):
+    """Django command to load test running API servers"""
+
+    help = (
+        'Send concurrent requests to one or more running servers, e.g. the WSGI stack at '
+        '/api/products/ and the ASGI stack at /api/async/products/, and report throughput.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='Full URLs to load, each tested in turn.')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 50, 100], help='Concurrent connections.')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per URL and concurrency level.')
+        parser.add_argument('--rows', type=int, default=1000, help='Products to seed for the benchmark user.')
+
+    def handle(self, *args, **options):
+        # The servers must use this database, the token is for its benchmark user
+        user = get_benchmark_user()
+        seed_catalog(user, options['rows'], stdout=self.stdout)
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+        for url in options['urls']:
+            self.stdout.write(url)
+            for concurrency in options['concurrency']:
+                latencies, errors = run_load(url, headers, concurrency, options['duration'])
+                if not latencies:
+                    self.stdout.write(f'  {concurrency:4} connections  no successful requests, {errors} errors')
+                    continue
+                self.stdout.write(
+                    f'  {concurrency:4} connections  {len(latencies) / options["duration"]:8.0f} requests/sec  '
+                    f'p50 {percentile(latencies, 50):8.2f} ms  p99 {percentile(latencies, 99):8.2f} ms  '
+                    f'{errors} errors'
+                )
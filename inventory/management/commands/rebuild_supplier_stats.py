@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from inventory.stats import REBUILD_BATCH_SIZE, rebuild_supplier_stats
+
+
+class Command(BaseCommand):
+    """Django command to recompute the supplier stats table from scratch"""
+
+    help = 'Rebuild the precomputed supplier stats from products and inventory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE, help='Suppliers rebuilt per transaction.')
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_supplier_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {rebuilt} suppliers'))
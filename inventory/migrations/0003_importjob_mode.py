@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 02:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='mode',
+            field=models.CharField(choices=[('create', 'Create'), ('upsert', 'Upsert')], default='create', max_length=20),
+        ),
+    ]
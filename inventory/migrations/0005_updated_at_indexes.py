@@ -0,0 +1,25 @@
+# Generated by Django 4.2.17 on 2026-10-18 02:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_per_user_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='inventory_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='product_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='supplier_user_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+FULLTEXT_INDEX_NAME = 'product_name_description_ft'
+
+
+# FULLTEXT indexes only exist on MySQL. Other databases (SQLite in local
+# tests) use the substring fallback in inventory.search instead.
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(
+        f"CREATE FULLTEXT INDEX {FULLTEXT_INDEX_NAME} ON inventory_product (name, description)"
+    )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(f"DROP INDEX {FULLTEXT_INDEX_NAME} ON inventory_product")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
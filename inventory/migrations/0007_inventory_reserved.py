@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 02:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_product_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='reserved',
+            field=models.IntegerField(default=0),
+        ),
+    ]
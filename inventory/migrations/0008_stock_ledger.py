@@ -0,0 +1,63 @@
+# Generated by Django 4.2.17 on 2026-10-18 02:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Existing quantities predate the ledger, so give each inventory an opening
+# movement for it; the ledger then sums to the current quantities.
+def record_opening_balances(apps, schema_editor):
+    Inventory = apps.get_model('inventory', 'Inventory')
+    StockMovement = apps.get_model('inventory', 'StockMovement')
+    movements = (
+        StockMovement(inventory_id=pk, delta=quantity, reason='opening')
+        for pk, quantity in Inventory.objects.exclude(quantity=0).values_list('pk', 'quantity').iterator()
+    )
+    batch = []
+    for movement in movements:
+        batch.append(movement)
+        if len(batch) == 1000:
+            StockMovement.objects.bulk_create(batch)
+            batch = []
+    StockMovement.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_inventory_reserved'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('reason', models.CharField(choices=[('opening', 'Opening balance'), ('create', 'Created'), ('update', 'Updated'), ('adjust', 'Adjusted')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='inventory.inventory')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.IntegerField()),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='inventory.inventory')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='snapshot_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stocksnapshot',
+            constraint=models.UniqueConstraint(fields=('inventory', 'date'), name='snapshot_inventory_date_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['inventory', 'created_at'], name='movement_inventory_created_idx'),
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.17 on 2026-10-18 02:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+
+
+# Seed the stats of existing suppliers; from here on they are kept up to date
+# incrementally (see inventory.stats).
+def populate_supplier_stats(apps, schema_editor):
+    Supplier = apps.get_model('inventory', 'Supplier')
+    Product = apps.get_model('inventory', 'Product')
+    SupplierStats = apps.get_model('inventory', 'SupplierStats')
+    value = ExpressionWrapper(F('price') * F('inventory__quantity'), output_field=DecimalField(max_digits=20, decimal_places=2))
+    totals = Product.objects.values('supplier').annotate(
+        product_count=Count('id'),
+        stock_value=Sum(value, default=0),
+        low_stock_count=Count('id', filter=Q(inventory__quantity__lt=10)),
+    ).order_by()
+    totals = {row.pop('supplier'): row for row in totals}
+    SupplierStats.objects.bulk_create(
+        [SupplierStats(supplier_id=pk, **totals.get(pk, {})) for pk in Supplier.objects.values_list('pk', flat=True)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplierStats',
+            fields=[
+                ('supplier', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='inventory.supplier')),
+                ('product_count', models.IntegerField(default=0)),
+                ('stock_value', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('low_stock_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(populate_supplier_stats, migrations.RunPython.noop),
+    ]
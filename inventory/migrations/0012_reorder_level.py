@@ -0,0 +1,44 @@
+# Generated by Django 4.2.17 on 2026-10-18 02:42
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+# Every product starts at the old fixed threshold of 10, so flag the
+# inventory already below it. Batched by id to keep each UPDATE short.
+def flag_low_stock(apps, schema_editor):
+    Inventory = apps.get_model('inventory', 'Inventory')
+    Product = apps.get_model('inventory', 'Product')
+    below = Exists(Product.objects.filter(pk=OuterRef('product_id'), reorder_level__gt=OuterRef('quantity')))
+    last = 0
+    while True:
+        ids = list(Inventory.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:1000])
+        if not ids:
+            return
+        Inventory.objects.filter(pk__in=ids).update(low_stock=below)
+        last = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_tombstone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='low_stock',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='reorder_level',
+            field=models.PositiveIntegerField(default=10),
+        ),
+        migrations.RunPython(flag_low_stock, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(fields=['user', 'low_stock', 'quantity'], name='inventory_user_low_stock_idx'),
+        ),
+    ]
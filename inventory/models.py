@@ -1,5 +1,11 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+# Reorder level of products that do not set their own
+DEFAULT_REORDER_LEVEL = 10
 
 class Supplier(models.Model):
     name = models.CharField(max_length=255)
@@ -8,6 +14,13 @@ class Supplier(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name'], name='supplier_user_name_idx'),
+            models.Index(fields=['user', 'created_at'], name='supplier_user_created_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='supplier_user_updated_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -16,19 +29,258 @@ class Product(models.Model):
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE)
+    reorder_level = models.PositiveIntegerField(default=DEFAULT_REORDER_LEVEL)  # Stock below this is low
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Every list query is scoped to request.user, so each index leads with user
+        indexes = [
+            models.Index(fields=['user', 'name'], name='product_user_name_idx'),
+            models.Index(fields=['user', 'price'], name='product_user_price_idx'),
+            models.Index(fields=['user', 'created_at'], name='product_user_created_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='product_user_updated_idx'),
+            models.Index(fields=['user', 'supplier', 'name'], name='product_user_supplier_name_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
 class Inventory(models.Model):
     product = models.OneToOneField(Product, on_delete=models.CASCADE)
     quantity = models.IntegerField()
+    reserved = models.IntegerField(default=0)  # Part of quantity held for pending orders
+    # Quantity is below the product's reorder level, kept current on every
+    # write so low stock lookups read a small indexed range
+    low_stock = models.BooleanField(default=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'quantity'], name='inventory_user_qty_idx'),
+            models.Index(fields=['user', 'created_at'], name='inventory_user_created_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='inventory_user_updated_idx'),
+            models.Index(fields=['user', 'low_stock', 'quantity'], name='inventory_user_low_stock_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.product.name} - {self.quantity}"
\ No newline at end of file
+        return f"{self.product.name} - {self.quantity}"
+
+class StockMovement(models.Model):
+    """
+    Append-only record of a change to an inventory quantity. The current
+    quantity is the sum of an inventory's movements.
+    """
+    REASON_OPENING = 'opening'
+    REASON_CREATE = 'create'
+    REASON_UPDATE = 'update'
+    REASON_ADJUST = 'adjust'
+    REASON_CHOICES = [
+        (REASON_OPENING, 'Opening balance'),
+        (REASON_CREATE, 'Created'),
+        (REASON_UPDATE, 'Updated'),
+        (REASON_ADJUST, 'Adjusted'),
+    ]
+
+    inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE, related_name='movements')
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=10, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['inventory', 'created_at'], name='movement_inventory_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.inventory_id}: {self.delta:+d} ({self.reason})"
+
+class StockSnapshot(models.Model):
+    """
+    Quantity of an inventory at the end of a day, written by the daily
+    compaction for every day the inventory had movements.
+    """
+    inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE, related_name='snapshots')
+    date = models.DateField()
+    quantity = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['inventory', 'date'], name='snapshot_inventory_date_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='snapshot_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.inventory_id} on {self.date}: {self.quantity}"
+
+class SupplierStats(models.Model):
+    """
+    Per-supplier totals kept up to date as products and inventory change, so
+    reports read one row per supplier instead of aggregating the catalog.
+    """
+    supplier = models.OneToOneField(Supplier, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    product_count = models.IntegerField(default=0)
+    stock_value = models.DecimalField(max_digits=20, decimal_places=2, default=0)  # sum of price * quantity
+    low_stock_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.supplier_id}: {self.product_count} products"
+
+class Tombstone(models.Model):
+    """
+    Record of a deleted product, supplier or inventory row, so delta syncs
+    can tell clients what to remove.
+    """
+    KIND_PRODUCT = 'product'
+    KIND_SUPPLIER = 'supplier'
+    KIND_INVENTORY = 'inventory'
+    KIND_CHOICES = [
+        (KIND_PRODUCT, 'Product'),
+        (KIND_SUPPLIER, 'Supplier'),
+        (KIND_INVENTORY, 'Inventory'),
+    ]
+
+    # No foreign key constraint: tombstones are written while the user's own
+    # rows are being deleted and must not block deleting the user
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted"
+
+class ImportJob(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    MODE_CREATE = 'create'
+    MODE_UPSERT = 'upsert'
+    MODE_CHOICES = [
+        (MODE_CREATE, 'Create'),
+        (MODE_UPSERT, 'Upsert'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    file_name = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    mode = models.CharField(max_length=20, choices=MODE_CHOICES, default=MODE_CREATE)
+    rows_total = models.IntegerField(null=True, blank=True)
+    rows_done = models.IntegerField(default=0)
+    rows_failed = models.IntegerField(default=0)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Import {self.pk} - {self.status}"
+
+    @property
+    def rows_per_second(self):
+        if not self.started_at:
+            return None
+        elapsed = ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+        if elapsed <= 0:
+            return None
+        return round((self.rows_done + self.rows_failed) / elapsed, 2)
+
+    # Progress is written with UPDATE ... SET col = col + n so that parallel
+    # shards can report into the same job without overwriting each other.
+    def _update(self, **fields):
+        ImportJob.objects.filter(pk=self.pk).update(updated_at=timezone.now(), **fields)
+
+    def mark_running(self):
+        self._update(status=self.STATUS_RUNNING, started_at=timezone.now())
+
+    def add_progress(self, done, failed):
+        self._update(rows_done=F('rows_done') + done, rows_failed=F('rows_failed') + failed)
+
+    def set_total(self, rows_total):
+        self._update(rows_total=rows_total)
+
+    def mark_completed(self):
+        self._update(
+            status=self.STATUS_COMPLETED,
+            finished_at=timezone.now(),
+            rows_total=Coalesce('rows_total', F('rows_done') + F('rows_failed')),
+        )
+
+    def mark_failed(self):
+        self._update(status=self.STATUS_FAILED, finished_at=timezone.now())
+
+class Report(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    FORMAT_CSV = 'csv'
+    FORMAT_XLSX = 'xlsx'
+    FORMAT_CHOICES = [
+        (FORMAT_CSV, 'CSV'),
+        (FORMAT_XLSX, 'Excel'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default=FORMAT_CSV)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    file_name = models.CharField(max_length=255, blank=True)  # storage name of the exported file
+    rows = models.IntegerField(default=0)
+    low_stock_rows = models.IntegerField(default=0)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Report {self.pk} - {self.status}"
+
+    @property
+    def download_name(self):
+        return f"inventory-report-{self.pk}.{self.format}"
+
+    def _update(self, **fields):
+        fields['updated_at'] = timezone.now()
+        Report.objects.filter(pk=self.pk).update(**fields)
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    def mark_running(self):
+        self._update(status=self.STATUS_RUNNING, started_at=timezone.now())
+
+    def mark_completed(self, file_name, rows, low_stock_rows):
+        self._update(
+            status=self.STATUS_COMPLETED,
+            finished_at=timezone.now(),
+            file_name=file_name,
+            rows=rows,
+            low_stock_rows=low_stock_rows,
+        )
+
+    def mark_failed(self):
+        self._update(status=self.STATUS_FAILED, finished_at=timezone.now())
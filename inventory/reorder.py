@@ -0,0 +1,25 @@
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Now
+
+from .models import Product
+
+
+def below_reorder_level(quantity):
+    """
+    Expression for an inventory UPDATE that is true when ``quantity`` (an
+    expression over the inventory row, e.g. ``OuterRef('quantity')``) is below
+    the reorder level of the row's product.
+    """
+    return Exists(Product.objects.filter(pk=OuterRef('product_id'), reorder_level__gt=quantity))
+
+
+def refresh_low_stock(queryset):
+    """
+    Recompute the low stock flag of the inventory rows in ``queryset`` with
+    a single UPDATE. Used after writes that bypass ``Inventory.save()``.
+
+    Only rows whose flag flips are written, and those get a new
+    ``updated_at`` so ETags and sync clients pick the change up.
+    """
+    low_stock = below_reorder_level(OuterRef('quantity'))
+    return queryset.exclude(low_stock=low_stock).update(low_stock=low_stock, updated_at=Now())
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA = 'replica'
+
+
+def primary_pin_key(user_id):
+    return f'inventory:primary:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """
+    Read the user's data from the primary for ``REPLICA_STICKY_SECONDS``, so
+    they see their own writes while the replica catches up.
+    """
+    if REPLICA in settings.DATABASES:
+        cache.set(primary_pin_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def read_database(user_id):
+    """
+    Return the database alias to read ``user_id``'s data from where some
+    replication lag is acceptable: the replica when one is configured and the
+    user has not written recently, otherwise the primary.
+    """
+    if REPLICA not in settings.DATABASES or cache.get(primary_pin_key(user_id)):
+        return DEFAULT_DB_ALIAS
+    return REPLICA
+
+
+class PrimaryReplicaRouter:
+    """
+    Send everything to the primary unless a queryset opts in to the replica
+    with ``.using(read_database(user_id))``. Objects read from the replica
+    are still saved, and their relations loaded, through the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema through replication
+        if db == REPLICA:
+            return False
+        return None
@@ -0,0 +1,131 @@
+import csv
+import io
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .exports import iterate_by_pk
+from .models import Inventory, Report
+from .replica import read_database
+
+REPORT_COLUMNS = ['product_id', 'product', 'supplier', 'price', 'quantity', 'reserved', 'stock_value', 'low_stock']
+
+CONTENT_TYPES = {
+    Report.FORMAT_CSV: 'text/csv',
+    Report.FORMAT_XLSX: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Emailed download links carry a signed report id instead of a JWT, so they
+# work from a mail client until REPORT_LINK_MAX_AGE runs out
+LINK_SALT = 'inventory.reports.download'
+
+
+def download_token(report):
+    return signing.dumps(report.pk, salt=LINK_SALT)
+
+
+def report_for_token(token):
+    """
+    Return the report a download link was signed for. Raises
+    ``signing.SignatureExpired`` for an expired link, ``signing.BadSignature``
+    for any other invalid one and ``Report.DoesNotExist`` for a deleted report.
+    """
+    pk = signing.loads(token, salt=LINK_SALT, max_age=settings.REPORT_LINK_MAX_AGE)
+    return Report.objects.get(pk=pk)
+
+
+def report_rows(user_id):
+    """
+    Yield one row per inventory item of the user, reading it in primary key
+    chunks so memory use does not depend on the catalog size.
+    """
+    queryset = (
+        Inventory.objects.using(read_database(user_id))
+        .filter(user_id=user_id)
+        .values('id', 'product_id', 'product__name', 'product__supplier__name', 'product__price', 'quantity', 'reserved', 'low_stock')
+    )
+    for row in iterate_by_pk(queryset, settings.REPORT_CHUNK_SIZE):
+        price, quantity = row['product__price'], row['quantity']
+        yield [
+            row['product_id'], row['product__name'], row['product__supplier__name'], price,
+            quantity, row['reserved'], price * quantity, row['low_stock'],
+        ]
+
+
+def write_csv(rows, file):
+    text = io.TextIOWrapper(file, encoding='utf-8', newline='')
+    writer = csv.writer(text)
+    writer.writerow(REPORT_COLUMNS)
+    writer.writerows(rows)
+    text.flush()
+    text.detach()
+
+
+def write_xlsx(rows, file):
+    from openpyxl import Workbook
+
+    # Write-only workbooks keep rows on disk rather than in memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Inventory')
+    sheet.append(REPORT_COLUMNS)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(file)
+
+
+WRITERS = {
+    Report.FORMAT_CSV: write_csv,
+    Report.FORMAT_XLSX: write_xlsx,
+}
+
+
+class RowCounter:
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+        self.low_stock = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.count += 1
+            self.low_stock += row[-1]
+            yield row
+
+
+def export_report(report):
+    """
+    Write ``report``'s rows to a temporary file as they are read and copy it
+    to storage chunk by chunk. Returns the storage name and the number of
+    rows and low stock rows written.
+    """
+    rows = RowCounter(report_rows(report.user_id))
+    with tempfile.TemporaryFile() as file:
+        WRITERS[report.format](rows, file)
+        file.seek(0)
+        name = f"{settings.REPORT_DIR}/{report.pk}-{uuid.uuid4().hex}.{report.format}"
+        name = default_storage.save(name, File(file))
+    return name, rows.count, rows.low_stock
+
+
+def stream_report(report, chunk_size=64 * 1024):
+    with default_storage.open(report.file_name, 'rb') as file:
+        yield from file.chunks(chunk_size)
+
+
+def purge_reports(now=None):
+    """
+    Delete reports created more than ``REPORT_RETENTION_DAYS`` ago, with
+    their files. Returns the number deleted.
+    """
+    horizon = (now or timezone.now()) - timedelta(days=settings.REPORT_RETENTION_DAYS)
+    expired = Report.objects.filter(created_at__lt=horizon)
+    for file_name in expired.exclude(file_name='').values_list('file_name', flat=True).iterator():
+        default_storage.delete(file_name)
+    deleted, _ = expired.delete()
+    return deleted
@@ -0,0 +1,61 @@
+import re
+
+from django.db import connection
+from django.db.models import Case, FloatField, Func, IntegerField, Q, Value, When
+
+# Characters with a meaning in MySQL boolean full-text queries
+BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@]+')
+
+FULLTEXT_INDEX_NAME = 'product_name_description_ft'
+
+
+class MatchAgainst(Func):
+    """
+    MySQL ``MATCH (columns) AGAINST (query IN BOOLEAN MODE)`` relevance score.
+    The columns must be covered by a single FULLTEXT index.
+    """
+    output_field = FloatField()
+
+    def __init__(self, *columns, query):
+        super().__init__(*columns, Value(query))
+
+    def as_sql(self, compiler, connection, **extra_context):
+        *columns, query = self.get_source_expressions()
+        sql, params = [], []
+        for column in columns:
+            column_sql, column_params = compiler.compile(column)
+            sql.append(column_sql)
+            params.extend(column_params)
+        query_sql, query_params = compiler.compile(query)
+        return f"MATCH ({', '.join(sql)}) AGAINST ({query_sql} IN BOOLEAN MODE)", params + query_params
+
+
+def search_terms(text):
+    return BOOLEAN_OPERATORS.sub(' ', text).split()
+
+
+def search_products(queryset, text):
+    """
+    Filter ``queryset`` to products whose name or description match any word
+    of ``text`` and order them by relevance.
+
+    On MySQL this uses the FULLTEXT index on (name, description) with prefix
+    matching on every word. Other databases fall back to substring matching,
+    ranking name matches above description matches.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return queryset.none()
+
+    if connection.vendor == 'mysql':
+        query = ' '.join(f'{term}*' for term in terms)
+        relevance = MatchAgainst('name', 'description', query=query)
+        return queryset.annotate(relevance=relevance).filter(relevance__gt=0).order_by('-relevance', 'id')
+
+    matches = Q()
+    score = Value(0)
+    for term in terms:
+        matches |= Q(name__icontains=term) | Q(description__icontains=term)
+        score += Case(When(name__icontains=term, then=2), default=0, output_field=IntegerField())
+        score += Case(When(description__icontains=term, then=1), default=0, output_field=IntegerField())
+    return queryset.filter(matches).annotate(relevance=score).order_by('-relevance', 'id')
@@ -1,5 +1,6 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Product, Supplier, Inventory
+from .models import Product, Supplier, Inventory, ImportJob, Report, SupplierStats
 
 class SupplierSerializer(serializers.ModelSerializer):
     class Meta:
@@ -10,11 +11,206 @@ class SupplierSerializer(serializers.ModelSerializer):
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = ['id', 'name', 'description', 'price', 'supplier', 'user']
+        fields = ['id', 'name', 'description', 'price', 'supplier', 'reorder_level', 'user']
         read_only_fields = ['user']
 
 class InventorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Inventory
+        fields = ['id', 'product', 'quantity', 'reserved', 'low_stock']
+        read_only_fields = ['user', 'reserved', 'low_stock']
+
+    def validate(self, attrs):
+        if self.instance is not None and 'quantity' in attrs:
+            check_reserved(attrs['quantity'], self.instance.reserved)
+        return attrs
+
+
+def check_reserved(quantity, reserved):
+    # Reserved units must stay covered by the stock, like adjust_stock checks
+    if quantity < reserved:
+        raise serializers.ValidationError({'quantity': [f'Cannot be below the {reserved} reserved units.']})
+
+
+class LowStockSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source='product.name', read_only=True)
+    reorder_level = serializers.IntegerField(source='product.reorder_level', read_only=True)
+    suggested_order = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Inventory
+        fields = ['id', 'product', 'name', 'quantity', 'reserved', 'reorder_level', 'suggested_order']
+        read_only_fields = fields
+
+    def get_suggested_order(self, obj):
+        # Enough to bring the unreserved stock back up to the reorder level
+        return obj.product.reorder_level - (obj.quantity - obj.reserved)
+
+
+class SupplierStatsSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source='supplier.name', read_only=True)
+
+    class Meta:
+        model = SupplierStats
+        fields = ['supplier', 'name', 'product_count', 'stock_value', 'low_stock_count', 'updated_at']
+        read_only_fields = ['supplier', 'product_count', 'stock_value', 'low_stock_count', 'updated_at']
+
+
+class StockAdjustmentSerializer(serializers.Serializer):
+    delta = serializers.IntegerField()
+
+
+class StockReservationSerializer(serializers.Serializer):
+    quantity = serializers.IntegerField(min_value=1)
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    rows_per_second = serializers.ReadOnlyField()
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'status', 'mode', 'rows_total', 'rows_done', 'rows_failed', 'rows_per_second',
+            'created_at', 'started_at', 'finished_at', 'updated_at',
+        ]
+        read_only_fields = fields
+
+
+class ReportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Report
+        fields = ['id', 'format', 'status', 'rows', 'low_stock_rows', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    ``many=True`` serializer behind the bulk endpoints.
+
+    Each item is validated on its own, then the whole batch is checked against
+    the database with one query per model: rows to update must exist and
+    belong to the user, and referenced rows must belong to the user. Invalid
+    items are collected in ``item_errors`` (keyed by their index in the
+    payload) instead of failing the whole request, and ``validated_data``
+    holds the remaining items in the order given by ``valid_indexes``.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.item_errors = {}
+        self.valid_indexes = []
+        self.instances = {}
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({'non_field_errors': ['Expected a list of items.']})
+        if not data:
+            raise serializers.ValidationError({'non_field_errors': ['This list may not be empty.']})
+        if len(data) > settings.BULK_MAX_ITEMS:
+            raise serializers.ValidationError(
+                {'non_field_errors': [f'A bulk request accepts at most {settings.BULK_MAX_ITEMS} items.']}
+            )
+
+        items = {}
+        for index, item in enumerate(data):
+            try:
+                items[index] = self.child.run_validation(item)
+            except serializers.ValidationError as e:
+                self.item_errors[index] = e.detail
+
+        if self.partial:
+            self.reject(items, self.check_instances(items))
+        self.reject(items, self.child.validate_batch(items, self.instances))
+        self.valid_indexes = list(items)
+        return list(items.values())
+
+    def reject(self, items, errors):
+        for index, error in errors.items():
+            self.item_errors[index] = error
+            del items[index]
+
+    def check_instances(self, items):
+        """
+        Updates identify their rows by ``id``: load all of them in one query.
+        """
+        errors = {}
+        seen = set()
+        for index, data in items.items():
+            if 'id' not in data:
+                errors[index] = {'id': ['This field is required.']}
+            elif data['id'] in seen:
+                errors[index] = {'id': ['Duplicate id in this request.']}
+            seen.add(data.get('id'))
+
+        model = self.child.Meta.model
+        user = self.context['request'].user
+        self.instances = model.objects.filter(user=user, pk__in=seen - {None}).in_bulk()
+        for index, data in items.items():
+            if index not in errors and data['id'] not in self.instances:
+                errors[index] = {'id': ['Not found.']}
+        return errors
+
+
+class ProductBulkSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+    supplier = serializers.IntegerField(source='supplier_id')
+
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'description', 'price', 'supplier', 'reorder_level']
+        list_serializer_class = BulkListSerializer
+
+    def validate_batch(self, items, instances):
+        user = self.context['request'].user
+        supplier_ids = {data['supplier_id'] for data in items.values() if 'supplier_id' in data}
+        owned = set(Supplier.objects.filter(user=user, pk__in=supplier_ids).values_list('pk', flat=True))
+        return {
+            index: {'supplier': ['Supplier not found.']}
+            for index, data in items.items()
+            if 'supplier_id' in data and data['supplier_id'] not in owned
+        }
+
+
+class InventoryBulkSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+    product = serializers.IntegerField(source='product_id')
+    quantity = serializers.IntegerField(min_value=0)
+
     class Meta:
         model = Inventory
         fields = ['id', 'product', 'quantity']
-        read_only_fields = ['user']
\ No newline at end of file
+        list_serializer_class = BulkListSerializer
+
+    def validate_batch(self, items, instances):
+        user = self.context['request'].user
+        product_ids = {data['product_id'] for data in items.values() if 'product_id' in data}
+        owned = set(Product.objects.filter(user=user, pk__in=product_ids).values_list('pk', flat=True))
+        # Each product has at most one inventory row
+        taken = dict(Inventory.objects.filter(product_id__in=product_ids).values_list('product_id', 'pk'))
+
+        errors = {}
+        claimed = set()
+        for index, data in items.items():
+            if 'quantity' in data and data.get('id') in instances:
+                try:
+                    check_reserved(data['quantity'], instances[data['id']].reserved)
+                except serializers.ValidationError as e:
+                    errors[index] = e.detail
+                    continue
+            if 'product_id' not in data:
+                continue
+            product_id = data['product_id']
+            if product_id not in owned:
+                errors[index] = {'product': ['Product not found.']}
+            elif product_id in claimed or taken.get(product_id, data.get('id')) != data.get('id'):
+                errors[index] = {'product': ['This product already has an inventory record.']}
+            claimed.add(product_id)
+        return errors
+
+
+class BulkDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+    def validate_ids(self, value):
+        if len(value) > settings.BULK_MAX_ITEMS:
+            raise serializers.ValidationError(f'A bulk request accepts at most {settings.BULK_MAX_ITEMS} items.')
+        return value
@@ -0,0 +1,170 @@
+import threading
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import forget_user_status
+from .models import Inventory, Product, Supplier, Tombstone
+from .reorder import refresh_low_stock
+from .stats import StatsDelta, create_supplier_stats, to_decimal
+
+# These keep SupplierStats current for single-object saves and deletes (API,
+# admin and cascades). Bulk writes and queryset updates do not send signals,
+# so those code paths update the stats themselves.
+
+_deletes = threading.local()
+
+
+class DeleteBatch:
+    """
+    Rows removed inside ``batched_deletes()``, so their stats and tombstones
+    are written with a few set based queries instead of some per row.
+    """
+
+    def __init__(self):
+        self.products = {}  # pk -> (supplier id, price, reorder level)
+        self.inventory = []  # (product id, quantity)
+        self.tombstones = []
+
+    def apply(self):
+        stats = StatsDelta()
+        for supplier_id, _, _ in self.products.values():
+            stats.add_products(supplier_id, -1)
+        # The products deleted alongside their inventory are gone by now, use
+        # the values they were deleted with
+        for product_id, quantity in self.inventory:
+            if product_id in self.products:
+                stats.add_stock(*self.products[product_id], quantity, sign=-1)
+        remaining = [(product_id, quantity, -1) for product_id, quantity in self.inventory if product_id not in self.products]
+        if remaining:
+            stats.add_inventory(remaining)
+        stats.apply()
+        Tombstone.objects.bulk_create(self.tombstones)
+
+
+@contextmanager
+def batched_deletes():
+    """
+    Collect the stats changes and tombstones of every delete in the block,
+    cascades included, and write them together when it ends, in the same
+    transaction as the deletes.
+    """
+    if getattr(_deletes, 'batch', None) is not None:
+        yield
+        return
+    _deletes.batch = batch = DeleteBatch()
+    try:
+        with transaction.atomic():
+            yield
+            batch.apply()
+    finally:
+        _deletes.batch = None
+
+
+def delete_batch():
+    return getattr(_deletes, 'batch', None)
+
+
+@receiver(post_save, sender=Supplier)
+def create_stats_for_supplier(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        create_supplier_stats([instance])
+
+
+@receiver(pre_save, sender=Product)
+def remember_product(sender, instance, raw=False, **kwargs):
+    instance._stats_previous = None
+    if instance.pk is not None and not raw:
+        instance._stats_previous = Product.objects.filter(pk=instance.pk).values_list('supplier_id', 'price', 'reorder_level').first()
+
+
+@receiver(post_save, sender=Product)
+def update_stats_for_product(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    stats = StatsDelta()
+    previous = getattr(instance, '_stats_previous', None)
+    if previous is None:
+        stats.add_products(instance.supplier_id, 1)
+    else:
+        supplier_id, price, reorder_level = previous
+        if (supplier_id, price, reorder_level) == (instance.supplier_id, to_decimal(instance.price), instance.reorder_level):
+            return
+        if reorder_level != instance.reorder_level:
+            refresh_low_stock(Inventory.objects.filter(product=instance))
+        stats.add_products(supplier_id, -1)
+        stats.add_products(instance.supplier_id, 1)
+        quantity = Inventory.objects.filter(product=instance).values_list('quantity', flat=True).first()
+        if quantity is not None:
+            stats.add_stock(supplier_id, price, reorder_level, quantity, sign=-1)
+            stats.add_stock(instance.supplier_id, instance.price, instance.reorder_level, quantity)
+    stats.apply()
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_stats(sender, instance, **kwargs):
+    batch = delete_batch()
+    if batch is not None:
+        batch.products[instance.pk] = (instance.supplier_id, instance.price, instance.reorder_level)
+        return
+    # The product's inventory is deleted first and removes its own stock
+    stats = StatsDelta()
+    stats.add_products(instance.supplier_id, -1)
+    stats.apply()
+
+
+@receiver(pre_save, sender=Inventory)
+def remember_inventory(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance.low_stock = instance.quantity < instance.product.reorder_level
+    instance._stats_previous = None
+    if instance.pk is not None and not raw:
+        instance._stats_previous = Inventory.objects.filter(pk=instance.pk).values_list('product_id', 'quantity').first()
+
+
+@receiver(post_save, sender=Inventory)
+def update_stats_for_inventory(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_stats_previous', None)
+    if previous == (instance.product_id, instance.quantity):
+        return
+    rows = [(instance.product_id, instance.quantity, 1)]
+    if previous is not None:
+        rows.append((*previous, -1))
+    stats = StatsDelta()
+    stats.add_inventory(rows)
+    stats.apply()
+
+
+@receiver(post_delete, sender=Inventory)
+def remove_inventory_from_stats(sender, instance, **kwargs):
+    batch = delete_batch()
+    if batch is not None:
+        batch.inventory.append((instance.product_id, instance.quantity))
+        return
+    stats = StatsDelta()
+    stats.add_inventory([(instance.product_id, instance.quantity, -1)])
+    stats.apply()
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_delete, sender=Inventory)
+def record_tombstone(sender, instance, **kwargs):
+    tombstone = Tombstone(user_id=instance.user_id, kind=sender._meta.model_name, object_id=instance.pk)
+    batch = delete_batch()
+    if batch is not None:
+        batch.tombstones.append(tombstone)
+    else:
+        tombstone.save()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    # Deactivated or deleted users lose access on their next request
+    forget_user_status(instance.pk)
@@ -0,0 +1,108 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from .models import Product, Supplier, SupplierStats
+
+REBUILD_BATCH_SIZE = 1000
+
+
+def to_decimal(value):
+    # Prices assigned in code may still be floats or strings before a refresh
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+class StatsDelta:
+    """
+    Changes to the stats of a set of suppliers, collected from any number of
+    product and inventory changes and applied with one UPDATE per supplier.
+    """
+
+    def __init__(self):
+        self.changes = defaultdict(lambda: [0, Decimal(0), 0])  # supplier id -> [products, value, low stock]
+
+    def add_products(self, supplier_id, count):
+        self.changes[supplier_id][0] += count
+
+    def add_stock(self, supplier_id, price, reorder_level, quantity, sign=1):
+        """
+        Add (or with ``sign=-1`` remove) the stock of one inventory row of a
+        product with the given price and reorder level.
+        """
+        change = self.changes[supplier_id]
+        change[1] += sign * to_decimal(price) * quantity
+        if quantity < reorder_level:
+            change[2] += sign
+
+    def add_inventory(self, rows):
+        """
+        Add the stock of (product id, quantity, sign) rows, looking up the
+        products' suppliers, prices and reorder levels with a single query.
+        """
+        rows = list(rows)
+        products = Product.objects.filter(pk__in={product_id for product_id, _, _ in rows})
+        products = {pk: values for pk, *values in products.values_list('pk', 'supplier_id', 'price', 'reorder_level')}
+        for product_id, quantity, sign in rows:
+            if product_id in products:
+                self.add_stock(*products[product_id], quantity, sign)
+
+    def apply(self):
+        now = timezone.now()
+        for supplier_id, (products, value, low) in self.changes.items():
+            if not (products or value or low):
+                continue
+            # Suppliers always get their stats row when created, so a missing
+            # row means the supplier is being deleted
+            SupplierStats.objects.filter(supplier_id=supplier_id).update(
+                product_count=F('product_count') + products,
+                stock_value=F('stock_value') + value,
+                low_stock_count=F('low_stock_count') + low,
+                updated_at=now,
+            )
+        self.changes.clear()
+
+
+def create_supplier_stats(suppliers):
+    SupplierStats.objects.bulk_create([SupplierStats(supplier=supplier) for supplier in suppliers], ignore_conflicts=True)
+
+
+def compute_supplier_stats(supplier_ids):
+    """
+    Aggregate the stats of the given suppliers from their products and
+    inventory. Suppliers without products are left out.
+    """
+    value = ExpressionWrapper(F('price') * F('inventory__quantity'), output_field=DecimalField(max_digits=20, decimal_places=2))
+    rows = (
+        Product.objects.filter(supplier_id__in=supplier_ids)
+        .values('supplier')
+        .annotate(
+            product_count=Count('id'),
+            stock_value=Sum(value, default=0),
+            low_stock_count=Count('id', filter=Q(inventory__low_stock=True)),
+        )
+        .order_by()
+    )
+    return {row.pop('supplier'): row for row in rows}
+
+
+def rebuild_supplier_stats(batch_size=REBUILD_BATCH_SIZE):
+    """
+    Recompute every supplier's stats from scratch, one batch of suppliers per
+    transaction. Returns the number of suppliers rebuilt.
+    """
+    rebuilt = 0
+    last = 0
+    while True:
+        ids = list(Supplier.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return rebuilt
+        computed = compute_supplier_stats(ids)
+        stats = [SupplierStats(supplier_id=supplier_id, **computed.get(supplier_id, {})) for supplier_id in ids]
+        with transaction.atomic():
+            SupplierStats.objects.filter(supplier_id__in=ids).delete()
+            SupplierStats.objects.bulk_create(stats)
+        rebuilt += len(ids)
+        last = ids[-1]
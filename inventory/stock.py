@@ -0,0 +1,60 @@
+from django.db import transaction
+from django.db.models import F, OuterRef, Q
+from django.utils import timezone
+
+from .ledger import record_movements
+from .models import Inventory, StockMovement
+from .reorder import below_reorder_level
+from .stats import StatsDelta
+
+
+class InsufficientStock(Exception):
+    pass
+
+
+def _apply(queryset, pk, guard, **changes):
+    """
+    Apply ``changes`` to one inventory row with a single conditional UPDATE,
+    so concurrent callers never overwrite each other and the guard is checked
+    against the committed row rather than a value the client read earlier.
+    """
+    updated = queryset.filter(pk=pk).filter(guard).update(updated_at=timezone.now(), **changes)
+    if not updated:
+        if not queryset.filter(pk=pk).exists():
+            raise Inventory.DoesNotExist
+        raise InsufficientStock
+    return queryset.values('id', 'product', 'quantity', 'reserved', 'low_stock').get(pk=pk)
+
+
+def adjust_stock(queryset, pk, delta):
+    """
+    Add ``delta`` (negative to remove stock) to the quantity, as long as the
+    result still covers the reserved units.
+    """
+    with transaction.atomic():
+        # The flag is assigned before the quantity: MySQL evaluates SET
+        # clauses left to right, so it must still see the old quantity there
+        data = _apply(
+            queryset, pk, Q(quantity__gte=F('reserved') - delta),
+            low_stock=below_reorder_level(OuterRef('quantity') + delta),
+            quantity=F('quantity') + delta,
+        )
+        record_movements([(data['id'], delta)], StockMovement.REASON_ADJUST)
+        stats = StatsDelta()
+        stats.add_inventory([(data['product'], data['quantity'] - delta, -1), (data['product'], data['quantity'], 1)])
+        stats.apply()
+    return data
+
+
+def reserve_stock(queryset, pk, amount):
+    """
+    Hold ``amount`` units of the unreserved stock.
+    """
+    return _apply(queryset, pk, Q(quantity__gte=F('reserved') + amount), reserved=F('reserved') + amount)
+
+
+def release_stock(queryset, pk, amount):
+    """
+    Give back ``amount`` previously reserved units.
+    """
+    return _apply(queryset, pk, Q(reserved__gte=amount), reserved=F('reserved') - amount)
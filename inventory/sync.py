@@ -0,0 +1,178 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Inventory, Product, Supplier, Tombstone
+from .serializers import InventorySerializer, ProductSerializer, SupplierSerializer
+from .values import ValuesRepresentation
+
+SYNC_MODELS = [
+    ('products', Tombstone.KIND_PRODUCT, Product, ProductSerializer),
+    ('suppliers', Tombstone.KIND_SUPPLIER, Supplier, SupplierSerializer),
+    ('inventory', Tombstone.KIND_INVENTORY, Inventory, InventorySerializer),
+]
+
+
+class InvalidToken(Exception):
+    pass
+
+
+class ExpiredToken(Exception):
+    pass
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def to_microseconds(when):
+    return int((when - EPOCH) / timedelta(microseconds=1))
+
+
+def from_microseconds(microseconds):
+    return EPOCH + timedelta(microseconds=microseconds)
+
+
+def encode_token(when):
+    # Microseconds since the epoch, so tokens compare and sort as numbers
+    return str(to_microseconds(when))
+
+
+def decode_token(token):
+    try:
+        microseconds = int(token)
+    except (TypeError, ValueError):
+        raise InvalidToken(token)
+    if microseconds < 0:
+        raise InvalidToken(token)
+    return from_microseconds(microseconds)
+
+
+def encode_page_token(since, page):
+    """
+    Token for the next page of a sync: where it started, where it stops and
+    the last (timestamp, id) sent from each stream.
+    """
+    state = {
+        'since': None if since is None else to_microseconds(since),
+        'until': to_microseconds(page['until']),
+        'after': {name: [to_microseconds(when), pk] for name, (when, pk) in page['after'].items()},
+        'done': sorted(page['done']),
+    }
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode()).decode()
+
+
+def read_token(token):
+    """
+    Return ``(since, page)`` for a token from a previous response: a plain
+    token starts a new sync, a page token continues one.
+    """
+    if token is None:
+        return None, None
+    if token.isdigit():
+        return decode_token(token), None
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token.encode()))
+        since = None if state['since'] is None else from_microseconds(state['since'])
+        page = {
+            'until': from_microseconds(state['until']),
+            'after': {name: (from_microseconds(when), pk) for name, (when, pk) in state['after'].items()},
+            'done': set(state['done']),
+        }
+    except (ValueError, TypeError, KeyError, AttributeError, OverflowError):
+        raise InvalidToken(token)
+    return since, page
+
+
+def tombstone_horizon(now=None):
+    """
+    Tombstones older than this are purged, so tokens older than this can
+    no longer report every deletion.
+    """
+    return (now or timezone.now()) - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+
+
+def next_rows(queryset, field, after, lookups, limit):
+    """
+    Up to ``limit`` rows of ``queryset`` after the ``(field, id)`` key
+    ``after``, in key order, and whether more follow.
+    """
+    if after is not None:
+        when, pk = after
+        queryset = queryset.filter(Q(**{f'{field}__gt': when}) | Q(**{field: when, 'id__gt': pk}))
+    rows = list(queryset.order_by(field, 'id').values(*lookups)[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+def changes_since(user, since=None, page=None):
+    """
+    Collect the user's products, suppliers and inventory changed at or after
+    ``since``, and the ids of those deleted since then. Without ``since``
+    every row is returned and there are no deletions to report.
+
+    Each stream is read ``SYNC_PAGE_SIZE`` rows at a time in
+    ``(updated_at, id)`` order. While ``has_more`` is set the token continues
+    the same sync, whose end is fixed when it starts; rows written meanwhile
+    come with the next one.
+
+    The final token lags the start of the sync by ``SYNC_TOKEN_OVERLAP``, so
+    rows written by transactions that were still open then are picked up by
+    the next sync. Rows in the overlap are sent again; clients apply changes
+    by id, which makes that harmless.
+    """
+    now = timezone.now()
+    if since is not None and since < tombstone_horizon(now):
+        raise ExpiredToken(since)
+    if page is None:
+        page = {'until': now, 'after': {}, 'done': set()}
+    until, limit = page['until'], settings.SYNC_PAGE_SIZE
+
+    data = {}
+    for name, kind, model, serializer_class in SYNC_MODELS:
+        representation = ValuesRepresentation(serializer_class())
+        rows = []
+        if name not in page['done']:
+            # The (user, updated_at, id) indexes serve these range scans
+            queryset = model.objects.filter(user=user, updated_at__lt=until)
+            if since is not None:
+                queryset = queryset.filter(updated_at__gte=since)
+            lookups = list(dict.fromkeys(['id', 'updated_at', *representation.lookups]))
+            rows, more = next_rows(queryset, 'updated_at', page['after'].get(name), lookups, limit)
+            if more:
+                page['after'][name] = (rows[-1]['updated_at'], rows[-1]['id'])
+            else:
+                page['done'].add(name)
+        data[name] = [representation(row) for row in rows]
+
+    deleted = {name: [] for name, _, _, _ in SYNC_MODELS}
+    if since is not None and 'deleted' not in page['done']:
+        names = {kind: name for name, kind, _, _ in SYNC_MODELS}
+        queryset = Tombstone.objects.filter(user=user, deleted_at__gte=since, deleted_at__lt=until)
+        rows, more = next_rows(queryset, 'deleted_at', page['after'].get('deleted'), ['id', 'deleted_at', 'kind', 'object_id'], limit)
+        for row in rows:
+            deleted[names[row['kind']]].append(row['object_id'])
+        if more:
+            page['after']['deleted'] = (rows[-1]['deleted_at'], rows[-1]['id'])
+        else:
+            page['done'].add('deleted')
+    elif since is None:
+        page['done'].add('deleted')
+    data['deleted'] = deleted
+
+    data['has_more'] = len(page['done']) < len(SYNC_MODELS) + 1
+    if data['has_more']:
+        data['token'] = encode_page_token(since, page)
+    else:
+        data['token'] = encode_token(until - timedelta(seconds=settings.SYNC_TOKEN_OVERLAP))
+    return data
+
+
+def purge_tombstones(now=None):
+    """
+    Delete tombstones past the retention period. Returns the number deleted.
+    """
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=tombstone_horizon(now)).delete()
+    return deleted
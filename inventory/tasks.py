@@ -1,49 +1,23 @@
-from celery import shared_task
-from django.core.mail import send_mail
-from .models import Product, Supplier
+from celery import chord, shared_task
+from django.core.mail import EmailMessage, send_mail
+from django.template.loader import render_to_string
+from django.urls import reverse
+from .models import ImportJob, Inventory, Report, SupplierStats
+from .importers import ProductImporter, iter_csv_rows, split_csv
+from .ledger import compact_movements
+from .reports import CONTENT_TYPES, download_token, export_report, purge_reports
+from .sync import purge_tombstones
+from .replica import read_database
+from django.core.files.storage import default_storage
 from django.contrib.auth.models import User
 import csv
 from io import StringIO
-from django.db import models
 from django.conf import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
-@shared_task
-def process_csv(file_data, user_email):
-    errors = []
-    success_count = 0
-    file = StringIO(file_data)
-    reader = csv.DictReader(file)
-
-    for row in reader:
-        try:
-            # Validate required fields
-            if not all(key in row for key in ['name', 'description', 'price', 'supplier']):
-                errors.append(f"Missing required fields in row: {row}")
-                continue
-
-            # Get or create the supplier
-            supplier, created = Supplier.objects.get_or_create(
-                name=row['supplier'],
-                user=User.objects.get(email=user_email)
-            )
-
-            # Create the product
-            Product.objects.create(
-                name=row['name'],
-                description=row['description'],
-                price=float(row['price']),  # Ensure price is a float
-                supplier=supplier,
-                user=User.objects.get(email=user_email)
-            )
-            success_count += 1
-        except Exception as e:
-            errors.append(f"Error processing row {row}: {str(e)}")
-            logger.error(f"Error processing row {row}: {str(e)}")
-
-    # Send email with results
+def send_import_summary(user_email, success_count, errors):
     send_mail(
         'CSV Processing Complete',
         f"Successfully processed {success_count} records. Errors: {errors}",
@@ -53,28 +27,228 @@ def process_csv(file_data, user_email):
     )
 
 
+def run_importer(user, rows, job=None, mode=ImportJob.MODE_CREATE):
+    importer = ProductImporter(user, job=job, upsert=mode == ImportJob.MODE_UPSERT)
+    try:
+        importer.run(rows)
+    except (UnicodeDecodeError, csv.Error) as e:
+        importer.add_error(f"Invalid CSV file: {str(e)}")
+        if job is not None:
+            job.add_progress(0, 1)
+    return importer
+
+
+def get_import_job(job_id, user, mode):
+    if job_id is None:
+        return ImportJob.objects.create(user=user, mode=mode)
+    return ImportJob.objects.get(pk=job_id)
+
+
+def import_rows(rows, user_email, job_id=None, mode=ImportJob.MODE_CREATE):
+    try:
+        user = User.objects.get(email=user_email)
+    except User.DoesNotExist:
+        logger.error(f"CSV import skipped, no user with email {user_email}")
+        return
+
+    job = get_import_job(job_id, user, mode)
+    job.mark_running()
+    try:
+        importer = run_importer(user, rows, job, mode)
+    except Exception:
+        job.mark_failed()
+        raise
+    job.mark_completed()
+
+    # Send email with results
+    send_import_summary(user_email, importer.success_count, importer.errors)
+
+
+# Imports are acknowledged when they start, even with CELERY_TASK_ACKS_LATE:
+# running one again after a worker died would create its products twice.
+@shared_task(acks_late=False)
+def process_csv(file_data, user_email, job_id=None, mode=ImportJob.MODE_CREATE):
+    import_rows(csv.DictReader(StringIO(file_data)), user_email, job_id, mode)
+
+
+@shared_task(acks_late=False)
+def process_csv_file(file_name, user_email, job_id=None, mode=ImportJob.MODE_CREATE):
+    """
+    Import a CSV file spooled to storage by the upload view, then delete it.
+    """
+    try:
+        import_rows(iter_csv_rows(file_name), user_email, job_id, mode)
+    finally:
+        default_storage.delete(file_name)
+
+
+@shared_task(acks_late=False)
+def process_csv_sharded(file_name, user_email, job_id=None, mode=ImportJob.MODE_CREATE):
+    """
+    Import a large spooled CSV file in parallel.
+
+    The file is split into row ranges of CSV_IMPORT_SHARD_ROWS rows and every
+    range is imported by its own import_csv_shard task. Suppliers are created
+    here first so the shards never race to create the same supplier, and
+    finish_csv_import sends one summary email once all shards are done.
+    """
+    try:
+        user = User.objects.get(email=user_email)
+    except User.DoesNotExist:
+        logger.error(f"CSV import skipped, no user with email {user_email}")
+        default_storage.delete(file_name)
+        return
+
+    job = get_import_job(job_id, user, mode)
+    job.mark_running()
+    try:
+        shard_names, supplier_names, row_count = split_csv(file_name, settings.CSV_IMPORT_SHARD_ROWS)
+        job.set_total(row_count)
+        ProductImporter(user).prefetch_suppliers(supplier_names)
+    except (UnicodeDecodeError, csv.Error) as e:
+        job.mark_failed()
+        send_import_summary(user_email, 0, [f"Invalid CSV file: {str(e)}"])
+        return
+    except Exception:
+        job.mark_failed()
+        raise
+    finally:
+        default_storage.delete(file_name)
+
+    if not shard_names:
+        job.mark_completed()
+        send_import_summary(user_email, 0, [])
+        return
+    chord(
+        import_csv_shard.s(name, user.pk, job.pk, mode) for name in shard_names
+    )(finish_csv_import.s(user_email, job.pk))
+
+
+@shared_task(acks_late=False)
+def import_csv_shard(file_name, user_id, job_id=None, mode=ImportJob.MODE_CREATE):
+    # A shard that raises would keep the chord from ever calling
+    # finish_csv_import, leaving the job running and the user without an
+    # email. Report the failure in the result instead.
+    try:
+        job = ImportJob.objects.get(pk=job_id) if job_id is not None else None
+        importer = run_importer(User.objects.get(pk=user_id), iter_csv_rows(file_name), job, mode)
+    except Exception as e:
+        logger.exception(f"CSV import shard {file_name} failed")
+        return {'success_count': 0, 'errors': [f"Part of the file could not be imported: {str(e)}"], 'failed': True}
+    finally:
+        default_storage.delete(file_name)
+    return {'success_count': importer.success_count, 'errors': importer.errors}
+
+
+@shared_task
+def finish_csv_import(results, user_email, job_id=None):
+    success_count = sum(result['success_count'] for result in results)
+    errors = [error for result in results for error in result['errors']]
+    if job_id is not None:
+        job = ImportJob.objects.get(pk=job_id)
+        if any(result.get('failed') for result in results):
+            job.mark_failed()
+        else:
+            job.mark_completed()
+    send_import_summary(user_email, success_count, errors)
+
+
 @shared_task
-def generate_inventory_report(user_email):
-    from .models import Inventory
-    from django.template.loader import render_to_string
-    from django.core.mail import EmailMessage
-    print(f"processing in inventory report: {user_email}")
-    low_stock = Inventory.objects.filter(quantity__lt=10, user__email=user_email)
-    supplier_performance = Supplier.objects.annotate(total_products=models.Count('product')).filter(user__email=user_email)
-
-    report = render_to_string('inventory/inventory_report.html', {
+def generate_inventory_report(user_email, report_id=None):
+    """
+    Export the user's inventory to a CSV or XLSX file in storage and email a
+    summary with a download link, attaching the file when it is small enough.
+    """
+    if report_id is None:
+        user = User.objects.filter(email=user_email).order_by('id').first()
+        if user is None:
+            logger.error(f"Inventory report skipped, no user with email {user_email}")
+            return
+        report = Report.objects.create(user=user)
+    else:
+        report = Report.objects.get(pk=report_id)
+    logger.info(f"Generating inventory report {report.pk} for {user_email}")
+    report.mark_running()
+    try:
+        file_name, rows, low_stock_rows = export_report(report)
+    except Exception:
+        logger.exception(f"Inventory report {report.pk} failed")
+        report.mark_failed()
+        raise
+    report.mark_completed(file_name, rows, low_stock_rows)
+    send_report_email(report, user_email)
+    return report.pk
+
+
+def send_report_email(report, user_email):
+    # The lowest items are listed inline, the full list is in the file.
+    # Join the product in, the template reads its name.
+    database = read_database(report.user_id)
+    low_stock = (
+        Inventory.objects.using(database)
+        .filter(user=report.user_id, low_stock=True)
+        .select_related('product')
+        .only('quantity', 'product__name')
+        .order_by('quantity', 'id')[:settings.REPORT_EMAIL_LOW_STOCK_ITEMS]
+    )
+    # One precomputed row per supplier rather than aggregating the catalog
+    supplier_performance = (
+        SupplierStats.objects.using(database)
+        .filter(supplier__user=report.user_id)
+        .select_related('supplier')
+        .only('product_count', 'stock_value', 'low_stock_count', 'supplier__name')
+        .order_by('supplier__name', 'supplier_id')
+    )
+    attach = default_storage.size(report.file_name) <= settings.REPORT_ATTACHMENT_MAX_SIZE
+
+    body = render_to_string('inventory/inventory_report.html', {
+        'report': report,
         'low_stock': low_stock,
         'supplier_performance': supplier_performance,
+        'download_url': settings.SITE_URL + reverse('report_link_download', args=[download_token(report)]),
+        'attached': attach,
     })
-
-    print(f"inventory report: {report}")
-
     email = EmailMessage(
         'Inventory Report',
-        report,
+        body,
         settings.EMAIL_HOST_USER,
         [user_email],
     )
-    print(f"email processing in inventory report: {email}")
     email.content_subtype = "html"
-    email.send()
\ No newline at end of file
+    if attach:
+        with default_storage.open(report.file_name, 'rb') as file:
+            email.attach(report.download_name, file.read(), CONTENT_TYPES[report.format])
+    email.send()
+
+
+@shared_task
+def compact_stock_movements():
+    """
+    Roll the stock movements of every complete day into daily snapshots.
+    Scheduled daily by Celery beat.
+    """
+    written = compact_movements()
+    logger.info(f"Wrote {written} stock snapshots")
+    return written
+
+
+@shared_task
+def purge_expired_tombstones():
+    """
+    Delete tombstones older than the sync retention period. Scheduled daily
+    by Celery beat.
+    """
+    deleted = purge_tombstones()
+    logger.info(f"Purged {deleted} tombstones")
+    return deleted
+
+
+@shared_task
+def purge_expired_reports():
+    """
+    Delete reports, and their files, older than the report retention period.
+    Scheduled daily by Celery beat.
+    """
+    deleted = purge_reports()
+    logger.info(f"Purged {deleted} reports")
+    return deleted
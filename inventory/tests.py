@@ -1,11 +1,71 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.contrib.auth.models import User
-from .models import Supplier, Product, Inventory
+from .models import Supplier, Product, Inventory, ImportJob, StockMovement, StockSnapshot, SupplierStats
+from .importers import ProductImporter, chunked
+from .filters import ProductFilter, InventoryFilter
+import os
+import re
+from unittest import skipIf, skipUnless
+import threading
+import warnings
+from .search import FULLTEXT_INDEX_NAME
+from .stock import InsufficientStock, adjust_stock
+from .ledger import compact_movements, stock_levels_at
+from .stats import compute_supplier_stats
+from django.core.management import call_command
+from django.db.models import Sum
+from django.utils import timezone
+from datetime import timedelta
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework import status
 import csv
 from io import StringIO
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core import mail
+from django.core.cache import cache
+from django.conf import settings
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from .tasks import process_csv, process_csv_file, process_csv_sharded, generate_inventory_report, run_importer
+from django.core.files.base import ContentFile
+from celery import current_app
+from django.core.files.storage import default_storage
+from unittest import mock
+import tempfile
+from decimal import Decimal
+from .models import Report, Tombstone
+from .serializers import InventorySerializer, InventoryBulkSerializer, ProductSerializer, SupplierSerializer
+from .tasks import send_report_email, purge_expired_reports, purge_expired_tombstones, compact_stock_movements, import_csv_shard, finish_csv_import
+from .reports import download_token, report_for_token, report_rows
+from .exports import catalog_rows
+from .cache import invalidate_user_cache
+from .views import ProductViewSet
+from .replica import PrimaryReplicaRouter, primary_pin_key, read_database
+from .sync import decode_token
+import io
+import json
+from openpyxl import load_workbook
+from django.utils.dateparse import parse_datetime
+
+
+def use_temporary_media_root(test, **overrides):
+    """
+    Point storage at a temporary directory for the duration of ``test``.
+    """
+    media_root = tempfile.TemporaryDirectory()
+    test.addCleanup(media_root.cleanup)
+    media_settings = test.settings(MEDIA_ROOT=media_root.name, **overrides)
+    media_settings.enable()
+    test.addCleanup(media_settings.disable)
+
+
+def queued_invalidations(callbacks):
+    """
+    The on_commit callbacks captured from invalidate_user_cache.
+    """
+    return [callback for callback in callbacks if callback.__qualname__.startswith('invalidate_user_cache.')]
+
 
 class ModelTests(TestCase):
     def setUp(self):
@@ -77,6 +137,190 @@ class AuthenticationTests(TestCase):
         self.assertIn('error', response.data)
 
 
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser27', email='test27@example.com', password='testpass123')
+        self.supplier = Supplier.objects.create(name='Test Supplier', contact_info='', user=self.user)
+        response = self.client.post('/api/login/', {'username': 'testuser27', 'password': 'testpass123'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def user_queries(self, path='/api/suppliers/'):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [query for query in queries if 'auth_user' in query['sql']]
+
+    def test_user_row_is_cached_between_requests(self):
+        self.assertEqual(len(self.user_queries()), 1)
+        self.assertEqual(self.user_queries(), [])
+
+    def test_claims_user_works_for_writes_and_email(self):
+        response = self.client.post('/api/products/', {
+            'name': 'Widget', 'description': 'Description', 'price': '1.00', 'supplier': self.supplier.id,
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Product.objects.get().user, self.user)
+
+        with mock.patch('inventory.views.generate_inventory_report.delay') as delay:
+            self.client.post('/api/generate-report/')
+        self.assertEqual(delay.call_args.args[0], 'test27@example.com')
+
+    def test_deactivated_user_is_rejected(self):
+        self.user_queries()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/suppliers/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_is_rejected(self):
+        self.user_queries()
+        self.user.delete()
+        self.assertEqual(self.client.get('/api/suppliers/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser28', email='test28@example.com', password='testpass123')
+        self.supplier = Supplier.objects.create(name='Test Supplier', contact_info='', user=self.user)
+        for i in range(12):
+            product = Product.objects.create(name=f'Product {i}', description='Description', price=f'{i}.50', supplier=self.supplier, user=self.user)
+            Inventory.objects.create(product=product, quantity=i, user=self.user)
+        other_user = User.objects.create_user(username='asyncother', email='asyncother@example.com', password='testpass123')
+        other_supplier = Supplier.objects.create(name='Other Supplier', contact_info='', user=other_user)
+        self.other_product = Product.objects.create(name='Other Product', description='Description', price='1.00', supplier=other_supplier, user=other_user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def assertSameAsDRF(self, path, async_path, params=None):
+        expected = self.client.get(path, params).json()
+        response = self.client.get(async_path, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        for key in ('next', 'previous'):
+            if data.get(key):
+                data[key] = data[key].replace('/api/async/', '/api/')
+        self.assertEqual(data, expected)
+
+    def test_lists_match_drf(self):
+        for params in [None, {'page': 2}, {'page_size': 5, 'page': 2}, {'page_size': 5, 'page': 3}]:
+            with self.subTest(params=params):
+                self.assertSameAsDRF('/api/products/', '/api/async/products/', params)
+                self.assertSameAsDRF('/api/inventory/', '/api/async/inventory/', params)
+        self.assertSameAsDRF('/api/products/', '/api/async/products/', {'name': 'Product 1'})
+        self.assertSameAsDRF('/api/inventory/', '/api/async/inventory/', {'quantity': 3})
+
+    def test_detail_matches_drf(self):
+        product = Product.objects.filter(user=self.user).first()
+        self.assertSameAsDRF(f'/api/products/{product.id}/', f'/api/async/products/{product.id}/')
+        self.assertSameAsDRF(f'/api/inventory/{product.inventory.id}/', f'/api/async/inventory/{product.inventory.id}/')
+
+    def test_other_users_rows_are_not_found(self):
+        response = self.client.get(f'/api/async/products/{self.other_product.id}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/async/products/', {'page': 3}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rejects_unauthenticated_and_writes(self):
+        self.assertEqual(self.client.post('/api/async/products/').status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.client.credentials()
+        response = self.client.get('/api/async/products/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('WWW-Authenticate', response)
+
+
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.user = User.objects.create_user(username='testuser29', email='test29@example.com', password='testpass123')
+
+    def test_writes_and_relations_go_to_primary(self):
+        supplier = Supplier.objects.create(name='Test Supplier', contact_info='', user=self.user)
+        supplier._state.db = 'replica'
+        self.assertEqual(self.router.db_for_write(Supplier, instance=supplier), 'default')
+        self.assertEqual(self.router.db_for_read(User, instance=supplier), 'default')
+        self.assertTrue(self.router.allow_relation(supplier, self.user))
+
+    def test_replica_lists_are_cached_for_the_sticky_window(self):
+        view = ProductViewSet()
+        view.list_database = 'replica'
+        with self.settings(LIST_CACHE_TIMEOUT=300, REPLICA_STICKY_SECONDS=10):
+            self.assertEqual(view.list_cache_timeout(), 10)
+            view.list_database = 'default'
+            self.assertEqual(view.list_cache_timeout(), 300)
+
+    def test_replica_is_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'inventory'))
+        self.assertIsNone(self.router.allow_migrate('default', 'inventory'))
+
+    def test_reads_use_primary_without_replica(self):
+        with self.settings(DATABASES={'default': settings.DATABASES['default']}):
+            self.assertEqual(read_database(self.user.pk), 'default')
+
+    def test_reads_stick_to_primary_after_write(self):
+        cache.clear()
+        # Only the configured aliases matter here, nothing connects to the replica
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            with self.settings(DATABASES={**settings.DATABASES, 'replica': settings.DATABASES['default']}):
+                self.assertEqual(read_database(self.user.pk), 'replica')
+                with self.captureOnCommitCallbacks(execute=True):
+                    invalidate_user_cache(self.user.pk)
+                self.assertEqual(read_database(self.user.pk), 'default')
+                cache.delete(primary_pin_key(self.user.pk))
+                self.assertEqual(read_database(self.user.pk), 'replica')
+
+
+@skipUnless('replica' in settings.DATABASES, "No replica database configured")
+class ReplicaReadTests(TestCase):
+    """
+    Needs a 'replica' database mirroring 'default' (TEST MIRROR). To run it
+    with SQLite, point both at the same file and give 'default' a file
+    TEST NAME too; the in-memory test database cannot be shared between the
+    two connections and fails with "database table is locked":
+
+        'default': {..., 'NAME': 'db.sqlite3', 'TEST': {'NAME': 'test_db.sqlite3'}},
+        'replica': {..., 'NAME': 'db.sqlite3', 'TEST': {'MIRROR': 'default'}},
+    """
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser30', email='test30@example.com', password='testpass123')
+        self.supplier = Supplier.objects.create(name='Test Supplier', contact_info='', user=self.user)
+        product = Product.objects.create(name='Widget', description='Description', price='1.00', supplier=self.supplier, user=self.user)
+        Inventory.objects.create(product=product, quantity=3, user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def queries(self, func):
+        with CaptureQueriesContext(connections['default']) as primary, CaptureQueriesContext(connections['replica']) as replica:
+            func()
+        return len(primary), len(replica)
+
+    def test_lists_read_from_replica(self):
+        primary, replica = self.queries(lambda: self.client.get('/api/products/'))
+        self.assertGreater(replica, 0)
+        self.assertEqual(primary, 0)
+
+    def test_detail_reads_from_primary(self):
+        product = Product.objects.get()
+        _, replica = self.queries(lambda: self.client.get(f'/api/products/{product.id}/'))
+        self.assertEqual(replica, 0)
+
+    def test_user_sticks_to_primary_after_write(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/suppliers/', {'name': 'Another', 'contact_info': '123-456-7890'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        primary, replica = self.queries(lambda: self.client.get('/api/suppliers/'))
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+
+    def test_export_and_report_read_from_replica(self):
+        self.assertEqual(self.queries(lambda: list(catalog_rows(self.user)))[0], 0)
+        self.assertEqual(self.queries(lambda: list(report_rows(self.user.pk)))[0], 0)
+
+
 class ProductTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -202,6 +446,7 @@ class CSVUploadTests(TestCase):
         self.client = APIClient()
         self.user = User.objects.create_user(username='testuser5', email='test5@example.com', password='testpass123')
         self.client.force_authenticate(user=self.user)
+        use_temporary_media_root(self)
 
     def test_csv_upload(self):
         csv_data = "name,description,price,supplier\nTest Product,Test Description,10.0,Test Supplier"
@@ -213,6 +458,44 @@ class CSVUploadTests(TestCase):
         response = self.client.post('/api/upload-csv/', {'file': csv_file}, format='multipart')
         self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
 
+    def test_csv_upload_spools_file_for_worker(self):
+        csv_data = "name,description,price,supplier\nTest Product,Test Description,10.0,Test Supplier\n"
+        csv_file = SimpleUploadedFile(name="test.csv", content=csv_data.encode('utf-8'), content_type="text/csv")
+        with mock.patch('inventory.views.process_csv_file.delay') as delay:
+            response = self.client.post('/api/upload-csv/', {'file': csv_file}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        file_name, user_email, job_id, mode = delay.call_args.args
+        self.assertEqual(user_email, self.user.email)
+        self.assertEqual(response.data['job_id'], job_id)
+        self.assertEqual(mode, ImportJob.MODE_CREATE)
+        self.assertTrue(default_storage.exists(file_name))
+
+        process_csv_file(file_name, user_email, job_id, mode)
+        self.assertFalse(default_storage.exists(file_name))
+        self.assertTrue(Product.objects.filter(name='Test Product', user=self.user).exists())
+
+        response = self.client.get(f'/api/imports/{job_id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], ImportJob.STATUS_COMPLETED)
+        self.assertEqual(response.data['rows_total'], 1)
+        self.assertEqual(response.data['rows_done'], 1)
+
+    def test_csv_upload_counts_rows_up_front(self):
+        csv_data = (
+            "name,description,price,supplier\n"
+            "Product A,\"Multi\nline\",10.0,Test Supplier\n"
+            "\n"
+            "Product B,Description,5.0,Test Supplier\n"
+        )
+        csv_file = SimpleUploadedFile(name="test.csv", content=csv_data.encode('utf-8'), content_type="text/csv")
+        with mock.patch('inventory.views.process_csv_file.delay') as delay:
+            response = self.client.post('/api/upload-csv/', {'file': csv_file}, format='multipart')
+
+        self.assertEqual(ImportJob.objects.get(pk=response.data['job_id']).rows_total, 2)
+        with default_storage.open(delay.call_args.args[0], 'rb') as spooled:
+            self.assertEqual(spooled.read(), csv_data.encode('utf-8'))
+
     def test_invalid_csv_upload(self):
         csv_data = "invalid,data\n1,2,3"
         csv_file = StringIO(csv_data)
@@ -224,15 +507,358 @@ class CSVUploadTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('error', response.data)
 
+class CSVImportTaskTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser10', email='test10@example.com', password='testpass123')
+        Supplier.objects.create(name='Supplier X', contact_info='123-456-7890', user=self.user)
+        use_temporary_media_root(self, CSV_IMPORT_SHARD_ROWS=2)
+
+    def test_process_csv_bulk_imports_rows(self):
+        csv_data = (
+            "name,description,price,supplier\n"
+            "Product A,Description A,19.99,Supplier X\n"
+            "Product B,Description B,9.99,Supplier Y\n"
+            "Product C,Description C,49.99,Supplier Y\n"
+        )
+        process_csv(csv_data, self.user.email)
+
+        self.assertEqual(Product.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(Supplier.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Product.objects.get(name='Product B').supplier.name, 'Supplier Y')
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('Successfully processed 3 records', mail.outbox[0].body)
+
+    def test_process_csv_reports_invalid_rows(self):
+        csv_data = (
+            "name,description,price,supplier\n"
+            "Product A,Description A,not-a-price,Supplier X\n"
+            "Product B,Description B,9.99\n"
+            "Product C,Description C,49.99,Supplier X\n"
+        )
+        process_csv(csv_data, self.user.email)
+
+        self.assertEqual(list(Product.objects.values_list('name', flat=True)), ['Product C'])
+        body = mail.outbox[0].body
+        self.assertIn('Successfully processed 1 records', body)
+        self.assertIn('Error processing row', body)
+        self.assertIn('Missing required fields in row', body)
+
+    def test_process_csv_query_count_is_independent_of_row_count(self):
+        def import_rows(count, offset):
+            rows = ''.join(f"Product {i},Description {i},{i}.50,Supplier {i % 3}\n" for i in range(offset, offset + count))
+            with CaptureQueriesContext(connection) as queries:
+                process_csv("name,description,price,supplier\n" + rows, self.user.email)
+            return len(queries)
+
+        import_rows(5, 0)  # create the suppliers up front
+        self.assertEqual(import_rows(5, 100), import_rows(50, 200))
+        self.assertEqual(Product.objects.count(), 60)
+
+
+    def test_process_csv_upsert_updates_existing_products(self):
+        csv_data = (
+            "name,description,price,supplier\n"
+            "Product A,Description A,19.99,Supplier X\n"
+            "Product B,Description B,9.99,Supplier X\n"
+        )
+        process_csv(csv_data, self.user.email, mode=ImportJob.MODE_UPSERT)
+        unchanged = Product.objects.get(name='Product B')
+
+        csv_data = (
+            "name,description,price,supplier\n"
+            "Product A,Description A,21.50,Supplier X\n"
+            "Product B,Description B,9.99,Supplier X\n"
+            "Product C,Description C,5.00,Supplier X\n"
+        )
+        process_csv(csv_data, self.user.email, mode=ImportJob.MODE_UPSERT)
+
+        self.assertEqual(Product.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(Product.objects.get(name='Product A').price, Decimal('21.50'))
+        self.assertEqual(Product.objects.get(name='Product B').updated_at, unchanged.updated_at)
+        self.assertIn('Successfully processed 3 records', mail.outbox[-1].body)
+
+    def test_upsert_writes_only_the_delta(self):
+        rows = [
+            {'name': f'Product {i}', 'description': 'Description', 'price': '1.00', 'supplier': 'Supplier X'}
+            for i in range(10)
+        ]
+        ProductImporter(self.user, upsert=True).run(rows)
+        rows[3] = dict(rows[3], price='2.00')
+        rows.append({'name': 'Product 10', 'description': 'Description', 'price': '1.00', 'supplier': 'Supplier X'})
+
+        importer = ProductImporter(self.user, upsert=True)
+        importer.run(rows)
+
+        self.assertEqual((importer.created_count, importer.updated_count, importer.success_count), (1, 1, 11))
+        self.assertEqual(Product.objects.filter(user=self.user).count(), 11)
+
+    @skipUnless(connection.vendor == 'mysql', 'Names are compared case-insensitively by the MySQL collation')
+    def test_upsert_matches_names_case_insensitively(self):
+        row = {'name': 'Widget', 'description': 'Description', 'price': '1.00', 'supplier': 'Supplier X'}
+        ProductImporter(self.user, upsert=True).run([row])
+
+        importer = ProductImporter(self.user, upsert=True)
+        importer.run([dict(row, name='widget', price='2.00')])
+
+        self.assertEqual((importer.created_count, importer.updated_count), (0, 1))
+        self.assertEqual(Product.objects.get(user=self.user).price, Decimal('2.00'))
+
+    def test_process_csv_sharded_merges_shard_results(self):
+        csv_data = (
+            "name,description,price,supplier\n"
+            "Product A,Description A,19.99,Supplier X\n"
+            "Product B,Description B,9.99,Supplier Y\n"
+            "Product C,Description C,bad,Supplier Y\n"
+            "Product D,\"Multi\nline\",5.00,Supplier Z\n"
+            "Product E,Description E,1.00,Supplier Z\n"
+        )
+        file_name = default_storage.save('imports/sharded.csv', ContentFile(csv_data.encode('utf-8')))
+        # The app reads Django settings, where the setting has the CELERY_ prefix
+        current_app.conf.CELERY_TASK_ALWAYS_EAGER = True
+        self.addCleanup(setattr, current_app.conf, 'CELERY_TASK_ALWAYS_EAGER', False)
+
+        process_csv_sharded(file_name, self.user.email)
+
+        self.assertEqual(Product.objects.filter(user=self.user).count(), 4)
+        self.assertEqual(Product.objects.get(name='Product D').description, 'Multi\nline')
+        self.assertEqual(Supplier.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('Successfully processed 4 records', mail.outbox[0].body)
+        self.assertIn('Product C', mail.outbox[0].body)
+        self.assertEqual(default_storage.listdir('imports')[1], [])
+
+    def test_sharded_import_skips_blank_lines(self):
+        csv_data = (
+            "name,description,price,supplier\n"
+            "Product A,Description A,19.99,Supplier X\n"
+            "\n"
+            "\n"
+            "Product B,Description B,9.99,Supplier X\n"
+        )
+        file_name = default_storage.save('imports/sharded.csv', ContentFile(csv_data.encode('utf-8')))
+        current_app.conf.CELERY_TASK_ALWAYS_EAGER = True
+        self.addCleanup(setattr, current_app.conf, 'CELERY_TASK_ALWAYS_EAGER', False)
+        job = ImportJob.objects.create(user=self.user, rows_total=2)
+
+        process_csv_sharded(file_name, self.user.email, job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_total, job.rows_done), (ImportJob.STATUS_COMPLETED, 2, 2))
+
+    def test_failed_shard_still_finishes_the_job(self):
+        csv_data = (
+            "name,description,price,supplier\n"
+            "Product A,Description A,19.99,Supplier X\n"
+            "Product B,Description B,9.99,Supplier X\n"
+            "Product C,Description C,5.00,Supplier X\n"
+        )
+        file_name = default_storage.save('imports/sharded.csv', ContentFile(csv_data.encode('utf-8')))
+        current_app.conf.CELERY_TASK_ALWAYS_EAGER = True
+        self.addCleanup(setattr, current_app.conf, 'CELERY_TASK_ALWAYS_EAGER', False)
+        job = ImportJob.objects.create(user=self.user)
+
+        # The first shard fails, the second imports its row
+        failures = [RuntimeError('database went away')]
+        def fail_once(*args):
+            if failures:
+                raise failures.pop()
+            return run_importer(*args)
+
+        with mock.patch('inventory.tasks.run_importer', side_effect=fail_once):
+            process_csv_sharded(file_name, self.user.email, job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_FAILED)
+        self.assertEqual(Product.objects.filter(user=self.user).count(), 1)
+        self.assertIn('Successfully processed 1 records', mail.outbox[0].body)
+        self.assertIn('database went away', mail.outbox[0].body)
+        self.assertEqual(default_storage.listdir('imports')[1], [])
+
+
+class TaskQueueTests(TestCase):
+    def queue(self, task):
+        return current_app.amqp.router.route({}, task.name)['queue'].name
+
+    def test_imports_and_reports_have_their_own_queues(self):
+        for task in [process_csv, process_csv_file, process_csv_sharded, import_csv_shard, finish_csv_import]:
+            self.assertEqual(self.queue(task), 'imports')
+        self.assertEqual(self.queue(generate_inventory_report), 'reports')
+        self.assertEqual(self.queue(compact_stock_movements), 'celery')
+
+    def test_imports_are_not_acknowledged_late(self):
+        self.assertTrue(generate_inventory_report.acks_late)
+        self.assertFalse(process_csv_file.acks_late)
+        self.assertFalse(import_csv_shard.acks_late)
+
+
+class ImportJobTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser11', email='test11@example.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def test_import_updates_progress_once_per_batch(self):
+        job = ImportJob.objects.create(user=self.user)
+        rows = [
+            {'name': f'Product {i}', 'description': 'Description', 'price': '1.00', 'supplier': 'Supplier'}
+            for i in range(5)
+        ]
+        rows.append({'name': 'Broken', 'description': 'Description', 'price': 'bad', 'supplier': 'Supplier'})
+        with CaptureQueriesContext(connection) as queries:
+            ProductImporter(self.user, batch_size=4, job=job).run(rows)
+
+        job_updates = [q for q in queries if q['sql'].startswith('UPDATE') and 'inventory_importjob' in q['sql']]
+        self.assertEqual(len(job_updates), 2)
+        job.refresh_from_db()
+        self.assertEqual((job.rows_done, job.rows_failed), (5, 1))
+
+    def test_get_import_job(self):
+        job = ImportJob.objects.create(user=self.user, rows_total=10, rows_done=4)
+        job.mark_running()
+        response = self.client.get(f'/api/imports/{job.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], ImportJob.STATUS_RUNNING)
+        self.assertEqual(response.data['rows_done'], 4)
+        self.assertIn('rows_per_second', response.data)
+
+    def test_get_import_job_of_another_user(self):
+        another_user = User.objects.create_user(username='anotheruser', email='another@example.com', password='testpass123')
+        job = ImportJob.objects.create(user=another_user)
+        response = self.client.get(f'/api/imports/{job.id}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
 class ReportTests(TestCase):
     def setUp(self):
         self.client = APIClient()
         self.user = User.objects.create_user(username='testuser6', email='test6@example.com', password='testpass123')
         self.client.force_authenticate(user=self.user)
+        use_temporary_media_root(self)
+        supplier = Supplier.objects.create(name='Test Supplier', contact_info='123-456-7890', user=self.user)
+        for i, quantity in enumerate([3, 40]):
+            product = Product.objects.create(name=f'Product {i}', description='Description', price='2.50', supplier=supplier, user=self.user)
+            Inventory.objects.create(product=product, quantity=quantity, user=self.user)
+
+    def generate(self, report_format=Report.FORMAT_CSV):
+        report = Report.objects.create(user=self.user, format=report_format)
+        generate_inventory_report(self.user.email, report.id)
+        report.refresh_from_db()
+        return report
+
+    def linked_report(self, email):
+        token = re.search(r'href="http://localhost:8000/api/reports/download/([^/"]+)/"', email.body).group(1)
+        return report_for_token(token)
 
     def test_generate_report(self):
         response = self.client.post('/api/generate-report/')
         self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        report = Report.objects.get(pk=response.data['report_id'])
+        self.assertEqual((report.user, report.format, report.status), (self.user, 'csv', 'pending'))
+
+    def test_report_for_an_unknown_email_is_skipped(self):
+        self.assertIsNone(generate_inventory_report('nobody@example.com'))
+        self.assertFalse(Report.objects.exists())
+        self.assertEqual(mail.outbox, [])
+
+    def test_generate_report_rejects_unknown_format(self):
+        response = self.client.post('/api/generate-report/', {'format': 'pdf'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_report_is_exported_to_csv(self):
+        report = self.generate()
+        self.assertEqual((report.status, report.rows, report.low_stock_rows), ('completed', 2, 1))
+        with default_storage.open(report.file_name, 'rb') as file:
+            rows = list(csv.reader(io.TextIOWrapper(file, encoding='utf-8')))
+        self.assertEqual(rows[0][:3], ['product_id', 'product', 'supplier'])
+        self.assertEqual(rows[1][1:], ['Product 0', 'Test Supplier', '2.50', '3', '0', '7.50', 'True'])
+
+    def test_report_is_exported_to_xlsx(self):
+        report = self.generate(Report.FORMAT_XLSX)
+        with default_storage.open(report.file_name, 'rb') as file:
+            sheet = load_workbook(io.BytesIO(file.read()), read_only=True).active
+            rows = list(sheet.values)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[2][1], 'Product 1')
+
+    def test_report_rows_are_read_in_primary_key_chunks(self):
+        with self.settings(REPORT_CHUNK_SIZE=1), CaptureQueriesContext(connection) as queries:
+            rows = list(report_rows(self.user.id))
+        self.assertEqual([row[1] for row in rows], ['Product 0', 'Product 1'])
+        self.assertEqual(len(queries), 3)
+
+    def test_purge_expired_reports(self):
+        old, recent = self.generate(), self.generate()
+        Report.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=8))
+        self.assertEqual(purge_expired_reports(), 1)
+        self.assertEqual(list(Report.objects.values_list('pk', flat=True)), [recent.pk])
+        self.assertFalse(default_storage.exists(old.file_name))
+        self.assertTrue(default_storage.exists(recent.file_name))
+
+    def test_report_email_attaches_small_files_and_links_the_download(self):
+        report = self.generate()
+        email = mail.outbox[0]
+        self.assertEqual(self.linked_report(email), report)
+        self.assertIn('Product 0 - 3', email.body)
+        self.assertEqual(email.attachments[0][0], f'inventory-report-{report.id}.csv')
+
+    def test_report_email_only_links_large_files(self):
+        with self.settings(REPORT_ATTACHMENT_MAX_SIZE=10):
+            report = self.generate()
+        self.assertEqual(mail.outbox[0].attachments, [])
+        self.assertEqual(self.linked_report(mail.outbox[0]), report)
+
+    def test_report_email_queries_do_not_depend_on_low_stock_items(self):
+        report = self.generate()
+        with self.assertNumQueries(2):
+            send_report_email(report, self.user.email)
+
+    def test_download_streams_the_file(self):
+        report = self.generate()
+        response = self.client.get(f'/api/reports/{report.id}/download/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn(f'inventory-report-{report.id}.csv', response['Content-Disposition'])
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('Product 1,Test Supplier,2.50,40', content)
+
+    def test_emailed_link_downloads_without_a_token(self):
+        report = self.generate()
+        url = f'/api/reports/download/{download_token(report)}/'
+        response = APIClient().get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Product 1,Test Supplier,2.50,40', b''.join(response.streaming_content).decode())
+
+        self.assertEqual(APIClient().get(url[:-3] + 'x/').status_code, status.HTTP_404_NOT_FOUND)
+        with self.settings(REPORT_LINK_MAX_AGE=-1):
+            self.assertEqual(APIClient().get(url).status_code, status.HTTP_410_GONE)
+
+    def test_download_redirects_to_shared_storage(self):
+        report = self.generate()
+        with self.settings(REPORT_DOWNLOAD_REDIRECT=True), \
+                mock.patch('inventory.views.default_storage.url', return_value='https://bucket.example/report') as url:
+            response = self.client.get(f'/api/reports/{report.id}/download/')
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(response['Location'], 'https://bucket.example/report')
+        self.assertIn(report.download_name, url.call_args.kwargs['parameters']['ResponseContentDisposition'])
+
+    def test_download_of_a_file_missing_from_storage(self):
+        report = self.generate()
+        default_storage.delete(report.file_name)
+        response = self.client.get(f'/api/reports/{report.id}/download/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_download_of_unfinished_report(self):
+        report = Report.objects.create(user=self.user)
+        response = self.client.get(f'/api/reports/{report.id}/download/')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_cannot_download_another_users_report(self):
+        report = self.generate()
+        another_user = User.objects.create_user(username='anotheruser', email='another@example.com', password='testpass123')
+        self.client.force_authenticate(user=another_user)
+        response = self.client.get(f'/api/reports/{report.id}/download/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
 class TokenObtainPairViewTests(TestCase):
     def setUp(self):
@@ -278,4 +904,1089 @@ class CustomFiltersAndPaginationTests(TestCase):
 
     def test_product_pagination(self):
         response = self.client.get('/api/products/?page=1&page_size=1')
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_product_cursor_pagination(self):
+        cache.clear()
+        Product.objects.create(name='Product 3', description='Description 3', price=30.0, supplier=self.supplier, user=self.user)
+        names = []
+        url = '/api/products/?pagination=cursor&page_size=2'
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertNotIn('count', response.data)
+                names += [product['name'] for product in response.data['results']]
+                url = response.data['next']
+        self.assertEqual(names, ['Product 1', 'Product 2', 'Product 3'])
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+
+class ListCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser15', email='test15@example.com', password='testpass123')
+        self.supplier = Supplier.objects.create(name='Test Supplier', contact_info='123-456-7890', user=self.user)
+        self.product = Product.objects.create(name='Test Product', description='Test Description', price=10.0, supplier=self.supplier, user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def list_names(self, url='/api/products/'):
+        return [product['name'] for product in self.client.get(url).data['results']]
+
+    def test_repeated_list_is_served_from_cache(self):
+        self.list_names()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.list_names(), ['Test Product'])
+
+    def test_cache_is_keyed_on_query_params(self):
+        self.list_names()
+        self.assertEqual(self.list_names('/api/products/?name=missing'), [])
+
+    def test_cache_is_per_user(self):
+        self.list_names()
+        another_user = User.objects.create_user(username='anotheruser', email='another@example.com', password='testpass123')
+        self.client.force_authenticate(user=another_user)
+        self.assertEqual(self.list_names(), [])
+
+    def test_writes_invalidate_cache(self):
+        self.list_names()
+        data = {'name': 'New Product', 'description': 'New Description', 'price': 20.0, 'supplier': self.supplier.id}
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.client.post('/api/products/', data, format='json')
+        self.assertTrue(queued_invalidations(callbacks))
+        self.assertEqual(self.list_names(), ['Test Product', 'New Product'])
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.client.delete(f'/api/products/{self.product.id}/')
+        self.assertTrue(queued_invalidations(callbacks))
+        self.assertEqual(self.list_names(), ['New Product'])
+
+    def test_csv_import_invalidates_cache(self):
+        self.list_names()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            process_csv("name,description,price,supplier\nImported,Description,1.00,Test Supplier\n", self.user.email)
+        self.assertTrue(queued_invalidations(callbacks))
+        self.assertEqual(self.list_names(), ['Test Product', 'Imported'])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser16', email='test16@example.com', password='testpass123')
+        self.supplier = Supplier.objects.create(name='Test Supplier', contact_info='123-456-7890', user=self.user)
+        self.product = Product.objects.create(name='Test Product', description='Test Description', price=10.0, supplier=self.supplier, user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_not_modified(self):
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_list_etag_changes_after_write(self):
+        etag = self.client.get('/api/products/')['ETag']
+        data = {'name': 'Renamed', 'description': 'Test Description', 'price': 10.0, 'supplier': self.supplier.id}
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.client.put(f'/api/products/{self.product.id}/', data, format='json')
+        self.assertTrue(queued_invalidations(callbacks))
+
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_cursor_page_not_modified_without_aggregate(self):
+        url = '/api/products/?pagination=cursor'
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(any('MAX(' in query['sql'] for query in queries))
+
+        data = {'name': 'Renamed', 'description': 'Test Description', 'price': 10.0, 'supplier': self.supplier.id}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(f'/api/products/{self.product.id}/', data, format='json')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_list_etag_depends_on_filters(self):
+        etag = self.client.get('/api/products/')['ETag']
+        response = self.client.get('/api/products/?name=Test', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_conditional_get(self):
+        response = self.client.get(f'/api/products/{self.product.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'Test Product')
+
+        response_etag = self.client.get(f'/api/products/{self.product.id}/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response_etag.status_code, status.HTTP_304_NOT_MODIFIED)
+        response_date = self.client.get(f'/api/products/{self.product.id}/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response_date.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_of_another_user(self):
+        another_user = User.objects.create_user(username='anotheruser', email='another@example.com', password='testpass123')
+        self.client.force_authenticate(user=another_user)
+        response = self.client.get(f'/api/products/{self.product.id}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BulkEndpointTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser17', email='test17@example.com', password='testpass123')
+        self.supplier = Supplier.objects.create(name='Test Supplier', contact_info='123-456-7890', user=self.user)
+        self.products = [
+            Product.objects.create(name=f'Product {i}', description='Description', price=10.0, supplier=self.supplier, user=self.user)
+            for i in range(3)
+        ]
+        self.inventory = Inventory.objects.create(product=self.products[0], quantity=5, user=self.user)
+        self.another_user = User.objects.create_user(username='anotheruser', email='another@example.com', password='testpass123')
+        self.other_supplier = Supplier.objects.create(name='Other Supplier', contact_info='', user=self.another_user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_bulk_create_products_reports_each_item(self):
+        data = [
+            {'name': 'New 1', 'description': 'Description', 'price': '1.00', 'supplier': self.supplier.id},
+            {'name': 'New 2', 'description': 'Description', 'price': '1.00', 'supplier': self.other_supplier.id},
+            {'name': '', 'description': 'Description', 'price': '1.00', 'supplier': self.supplier.id},
+            {'name': 'New 3', 'description': 'Description', 'price': '2.00', 'supplier': self.supplier.id},
+        ]
+        response = self.client.post('/api/products/bulk/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([r['status'] for r in results], ['created', 'error', 'error', 'created'])
+        self.assertIn('supplier', results[1]['errors'])
+        self.assertIn('name', results[2]['errors'])
+        self.assertEqual(Product.objects.filter(user=self.user, name__startswith='New').count(), 2)
+
+    def test_bulk_create_conflicting_with_a_concurrent_request(self):
+        validate_batch = InventoryBulkSerializer.validate_batch
+        calls = []
+        def validate_before_the_other_commit(serializer, items, instances):
+            # The first check runs before the concurrent inventory row exists
+            calls.append(items)
+            return {} if len(calls) == 1 else validate_batch(serializer, items, instances)
+
+        data = [{'product': self.products[0].id, 'quantity': 1}, {'product': self.products[1].id, 'quantity': 2}]
+        with mock.patch.object(InventoryBulkSerializer, 'validate_batch', validate_before_the_other_commit):
+            response = self.client.post('/api/inventory/bulk/', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual([r['index'] for r in response.data['results']], [0])
+        self.assertIn('product', response.data['results'][0]['errors'])
+        self.assertFalse(Inventory.objects.filter(product=self.products[1]).exists())
+
+    def test_bulk_create_query_count_is_independent_of_size(self):
+        def create(count):
+            data = [
+                {'name': f'Bulk {i}', 'description': 'Description', 'price': '1.00', 'supplier': self.supplier.id}
+                for i in range(count)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post('/api/products/bulk/', data, format='json')
+            return len(queries)
+
+        self.assertEqual(create(2), create(50))
+
+    def test_bulk_update_inventory(self):
+        other_inventory = Inventory.objects.create(product=self.products[1], quantity=1, user=self.user)
+        foreign = Inventory.objects.create(
+            product=Product.objects.create(name='Foreign', description='', price=1, supplier=self.other_supplier, user=self.another_user),
+            quantity=3, user=self.another_user,
+        )
+        data = [
+            {'id': self.inventory.id, 'quantity': 50},
+            {'id': other_inventory.id, 'quantity': -1},
+            {'id': foreign.id, 'quantity': 10},
+            {'quantity': 10},
+        ]
+        response = self.client.put('/api/inventory/bulk/', data, format='json')
+        self.assertEqual([r['status'] for r in response.data['results']], ['updated', 'error', 'error', 'error'])
+        self.inventory.refresh_from_db()
+        foreign.refresh_from_db()
+        self.assertEqual((self.inventory.quantity, foreign.quantity), (50, 3))
+
+    def test_bulk_create_inventory_rejects_taken_products(self):
+        data = [
+            {'product': self.products[0].id, 'quantity': 1},
+            {'product': self.products[1].id, 'quantity': 1},
+            {'product': self.products[1].id, 'quantity': 2},
+        ]
+        response = self.client.post('/api/inventory/bulk/', data, format='json')
+        self.assertEqual([r['status'] for r in response.data['results']], ['error', 'created', 'error'])
+        self.assertEqual(Inventory.objects.get(product=self.products[1]).quantity, 1)
+
+    def test_bulk_delete_products(self):
+        foreign = Product.objects.create(name='Foreign', description='', price=1, supplier=self.other_supplier, user=self.another_user)
+        ids = [self.products[0].id, foreign.id, self.products[1].id]
+        response = self.client.delete('/api/products/bulk/', {'ids': ids}, format='json')
+        self.assertEqual([r['status'] for r in response.data['results']], ['deleted', 'error', 'deleted'])
+        self.assertTrue(Product.objects.filter(pk=foreign.id).exists())
+        self.assertEqual(Product.objects.filter(user=self.user).count(), 1)
+
+    def test_bulk_rejects_malformed_payload(self):
+        response = self.client.post('/api/products/bulk/', {'name': 'Not a list'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(BULK_MAX_ITEMS=1):
+            response = self.client.put('/api/inventory/bulk/', [{'id': 1}, {'id': 2}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class StockChangeTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser18', email='test18@example.com', password='testpass123')
+        supplier = Supplier.objects.create(name='Test Supplier', contact_info='123-456-7890', user=self.user)
+        product = Product.objects.create(name='Test Product', description='Description', price=10.0, supplier=supplier, user=self.user)
+        self.inventory = Inventory.objects.create(product=product, quantity=10, user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_adjust_adds_and_removes_stock(self):
+        response = self.client.post(f'/api/inventory/{self.inventory.id}/adjust/', {'delta': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['quantity'], 15)
+        response = self.client.post(f'/api/inventory/{self.inventory.id}/adjust/', {'delta': -15})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['quantity'], 0)
+
+    def test_adjust_cannot_go_negative(self):
+        response = self.client.post(f'/api/inventory/{self.inventory.id}/adjust/', {'delta': -11})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.quantity, 10)
+
+    def test_reserved_stock_cannot_be_removed(self):
+        response = self.client.post(f'/api/inventory/{self.inventory.id}/reserve/', {'quantity': 4})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['reserved'], 4)
+        response = self.client.post(f'/api/inventory/{self.inventory.id}/adjust/', {'delta': -7})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        response = self.client.post(f'/api/inventory/{self.inventory.id}/reserve/', {'quantity': 7})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        response = self.client.post(f'/api/inventory/{self.inventory.id}/adjust/', {'delta': -6})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['quantity'], 4)
+
+    def test_updates_cannot_set_quantity_below_reserved(self):
+        self.client.post(f'/api/inventory/{self.inventory.id}/reserve/', {'quantity': 4})
+        product = self.inventory.product_id
+        response = self.client.put(f'/api/inventory/{self.inventory.id}/', {'product': product, 'quantity': 3})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.put('/api/inventory/bulk/', [{'id': self.inventory.id, 'quantity': 3}], format='json')
+        self.assertEqual(response.data['results'][0]['status'], 'error')
+        self.inventory.refresh_from_db()
+        self.assertEqual((self.inventory.quantity, self.inventory.reserved), (10, 4))
+
+        response = self.client.put(f'/api/inventory/{self.inventory.id}/', {'product': product, 'quantity': 4})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['reserved'], 4)
+
+    def test_release_returns_reserved_stock(self):
+        self.client.post(f'/api/inventory/{self.inventory.id}/reserve/', {'quantity': 3})
+        response = self.client.post(f'/api/inventory/{self.inventory.id}/release/', {'quantity': 4})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        response = self.client.post(f'/api/inventory/{self.inventory.id}/release/', {'quantity': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['reserved'], 0)
+
+    def test_reserve_requires_positive_quantity(self):
+        response = self.client.post(f'/api/inventory/{self.inventory.id}/reserve/', {'quantity': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cannot_change_another_users_stock(self):
+        another_user = User.objects.create_user(username='anotheruser', email='another@example.com', password='testpass123')
+        self.client.force_authenticate(user=another_user)
+        response = self.client.post(f'/api/inventory/{self.inventory.id}/adjust/', {'delta': 1})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_stock_change_uses_a_single_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            adjust_stock(Inventory.objects.filter(user=self.user), self.inventory.id, -1)
+        updates = [query for query in queries if query['sql'].startswith('UPDATE') and 'inventory_inventory' in query['sql']]
+        self.assertEqual(len(updates), 1)
+
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser20', email='test20@example.com', password='testpass123')
+        self.supplier = Supplier.objects.create(name='Test Supplier', contact_info='123-456-7890', user=self.user)
+        self.product = Product.objects.create(name='Test Product', description='Description', price=10.0, supplier=self.supplier, user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def create_inventory(self, quantity=10):
+        response = self.client.post('/api/inventory/', {'product': self.product.id, 'quantity': quantity})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Inventory.objects.get(pk=response.data['id'])
+
+    def assertLedgerMatches(self, inventory):
+        inventory.refresh_from_db()
+        total = StockMovement.objects.filter(inventory=inventory).aggregate(total=Sum('delta'))['total']
+        self.assertEqual(total, inventory.quantity)
+
+    def backdate(self, inventory, days):
+        # Move an inventory and all its movements so far to ``days`` days ago
+        moved = timezone.now() - timedelta(days=days)
+        StockMovement.objects.filter(inventory=inventory, created_at__gt=moved).update(created_at=moved)
+        Inventory.objects.filter(pk=inventory.pk, created_at__gt=moved).update(created_at=moved)
+
+    def test_every_quantity_change_is_recorded(self):
+        inventory = self.create_inventory(10)
+        self.client.put(f'/api/inventory/{inventory.id}/', {'product': self.product.id, 'quantity': 7})
+        self.client.post(f'/api/inventory/{inventory.id}/adjust/', {'delta': 5})
+        self.client.post(f'/api/inventory/{inventory.id}/reserve/', {'quantity': 2})
+        reasons = list(StockMovement.objects.filter(inventory=inventory).order_by('id').values_list('reason', 'delta'))
+        self.assertEqual(reasons, [('create', 10), ('update', -3), ('adjust', 5)])
+        self.assertLedgerMatches(inventory)
+
+    def test_rejected_adjustment_is_not_recorded(self):
+        inventory = self.create_inventory(1)
+        self.client.post(f'/api/inventory/{inventory.id}/adjust/', {'delta': -2})
+        self.assertEqual(StockMovement.objects.filter(inventory=inventory).count(), 1)
+
+    def test_bulk_changes_are_recorded_in_one_insert(self):
+        products = [
+            Product.objects.create(name=f'Product {i}', description='Description', price=10.0, supplier=self.supplier, user=self.user)
+            for i in range(3)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post('/api/inventory/bulk/', [{'product': product.id, 'quantity': 4} for product in products], format='json')
+        inserts = [query for query in queries if query['sql'].startswith('INSERT') and 'inventory_stockmovement' in query['sql']]
+        self.assertEqual(len(inserts), 1)
+
+        inventories = list(Inventory.objects.filter(product__in=products))
+        self.client.put('/api/inventory/bulk/', [{'id': inventory.id, 'quantity': 1} for inventory in inventories], format='json')
+        for inventory in inventories:
+            self.assertLedgerMatches(inventory)
+
+    def test_compaction_writes_one_snapshot_per_active_day(self):
+        inventory = self.create_inventory(10)
+        self.backdate(inventory, 3)
+        adjust_stock(Inventory.objects.all(), inventory.id, 2)
+        adjust_stock(Inventory.objects.all(), inventory.id, -1)
+        self.backdate(inventory, 1)
+        adjust_stock(Inventory.objects.all(), inventory.id, 4)
+
+        self.assertEqual(compact_movements(), 2)
+        snapshots = list(StockSnapshot.objects.filter(inventory=inventory).order_by('date').values_list('date', 'quantity'))
+        today = timezone.localdate()
+        self.assertEqual(snapshots, [(today - timedelta(days=3), 10), (today - timedelta(days=1), 11)])
+        # Already compacted days are not written again
+        self.assertEqual(compact_movements(), 0)
+
+    def test_stock_levels_at_combines_snapshot_and_tail(self):
+        inventory = self.create_inventory(10)
+        self.backdate(inventory, 3)
+        adjust_stock(Inventory.objects.all(), inventory.id, 5)
+        self.backdate(inventory, 1)
+        compact_movements()
+        adjust_stock(Inventory.objects.all(), inventory.id, -4)
+
+        inventories = Inventory.objects.filter(pk=inventory.pk)
+        now = timezone.now()
+        self.assertEqual(stock_levels_at(inventories, now - timedelta(days=4)), {})
+        self.assertEqual(stock_levels_at(inventories, now - timedelta(days=2)), {inventory.pk: 10})
+        self.assertEqual(stock_levels_at(inventories, now - timedelta(hours=12)), {inventory.pk: 15})
+        self.assertEqual(stock_levels_at(inventories, now), {inventory.pk: 11})
+
+    def test_stock_at_endpoint(self):
+        inventory = self.create_inventory(10)
+        self.backdate(inventory, 2)
+        self.client.post(f'/api/inventory/{inventory.id}/adjust/', {'delta': 3})
+        at = (timezone.now() - timedelta(days=1)).isoformat()
+        response = self.client.get('/api/inventory/stock-at/', {'at': at})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [{'id': inventory.id, 'product': self.product.id, 'quantity': 10}])
+
+    def test_stock_at_requires_a_datetime(self):
+        response = self.client.get('/api/inventory/stock-at/', {'at': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SupplierStatsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser21', email='test21@example.com', password='testpass123')
+        self.supplier = Supplier.objects.create(name='Supplier A', contact_info='', user=self.user)
+        self.other_supplier = Supplier.objects.create(name='Supplier B', contact_info='', user=self.user)
+        self.client.force_authenticate(user=self.user)
+        use_temporary_media_root(self)
+
+    def stats(self, supplier):
+        stats = SupplierStats.objects.get(supplier=supplier)
+        return stats.product_count, stats.stock_value, stats.low_stock_count
+
+    def assertStatsCurrent(self):
+        # The incrementally maintained stats must equal a full recompute
+        computed = compute_supplier_stats([self.supplier.pk, self.other_supplier.pk])
+        for supplier in (self.supplier, self.other_supplier):
+            expected = computed.get(supplier.pk, {'product_count': 0, 'stock_value': 0, 'low_stock_count': 0})
+            self.assertEqual(self.stats(supplier), (expected['product_count'], expected['stock_value'], expected['low_stock_count']))
+
+    def create_product(self, price='10.00', supplier=None):
+        response = self.client.post('/api/products/', {
+            'name': 'Product', 'description': 'Description', 'price': price, 'supplier': (supplier or self.supplier).id,
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def test_new_supplier_gets_empty_stats(self):
+        self.assertEqual(self.stats(self.supplier), (0, Decimal('0'), 0))
+
+    def test_single_object_changes_keep_stats_current(self):
+        product_id = self.create_product('10.00')
+        response = self.client.post('/api/inventory/', {'product': product_id, 'quantity': 5})
+        inventory_id = response.data['id']
+        self.assertEqual(self.stats(self.supplier), (1, Decimal('50.00'), 1))
+
+        self.client.put(f'/api/inventory/{inventory_id}/', {'product': product_id, 'quantity': 20})
+        self.assertEqual(self.stats(self.supplier), (1, Decimal('200.00'), 0))
+        self.client.post(f'/api/inventory/{inventory_id}/adjust/', {'delta': -15})
+        self.assertEqual(self.stats(self.supplier), (1, Decimal('50.00'), 1))
+
+        self.client.put(f'/api/products/{product_id}/', {
+            'name': 'Product', 'description': 'Description', 'price': '12.50', 'supplier': self.other_supplier.id,
+        })
+        self.assertStatsCurrent()
+        self.assertEqual(self.stats(self.other_supplier), (1, Decimal('62.50'), 1))
+
+        self.client.delete(f'/api/inventory/{inventory_id}/')
+        self.assertEqual(self.stats(self.other_supplier), (1, Decimal('0.00'), 0))
+        self.client.post('/api/inventory/', {'product': product_id, 'quantity': 2})
+        self.client.delete(f'/api/products/{product_id}/')
+        self.assertStatsCurrent()
+        self.assertEqual(self.stats(self.other_supplier), (0, Decimal('0.00'), 0))
+
+    def test_bulk_changes_keep_stats_current(self):
+        response = self.client.post('/api/products/bulk/', [
+            {'name': f'Product {i}', 'description': 'Description', 'price': '2.00', 'supplier': self.supplier.id}
+            for i in range(4)
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        products = list(Product.objects.filter(user=self.user).order_by('id'))
+        self.client.post('/api/inventory/bulk/', [{'product': product.id, 'quantity': 10} for product in products], format='json')
+        self.assertEqual(self.stats(self.supplier), (4, Decimal('80.00'), 0))
+
+        inventories = list(Inventory.objects.filter(user=self.user).order_by('id'))
+        self.client.put('/api/inventory/bulk/', [{'id': inventories[0].id, 'quantity': 1}], format='json')
+        self.client.put('/api/products/bulk/', [
+            {'id': products[1].id, 'price': '3.00'},
+            {'id': products[2].id, 'supplier': self.other_supplier.id},
+        ], format='json')
+        self.client.delete('/api/products/bulk/', {'ids': [products[3].id]}, format='json')
+        self.assertStatsCurrent()
+
+    def test_bulk_delete_queries_do_not_depend_on_row_count(self):
+        def bulk_delete(count):
+            ids = []
+            for i in range(count):
+                product = Product.objects.create(name=f'Product {i}', description='Description', price='2.00', supplier=self.supplier, user=self.user)
+                Inventory.objects.create(product=product, quantity=3, user=self.user)
+                ids.append(product.id)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.delete('/api/products/bulk/', {'ids': ids}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(Tombstone.objects.filter(object_id__in=ids, kind=Tombstone.KIND_PRODUCT).count(), count)
+            return len(queries)
+
+        Product.objects.create(name='Kept', description='Description', price='5.00', supplier=self.supplier, user=self.user)
+        self.assertEqual(bulk_delete(2), bulk_delete(6))
+        self.assertEqual(self.stats(self.supplier), (1, Decimal('0.00'), 0))
+        self.assertStatsCurrent()
+
+    def test_supplier_delete_cascades_in_batches(self):
+        for i in range(3):
+            product_id = self.create_product('2.00')
+            self.client.post('/api/inventory/', {'product': product_id, 'quantity': 1})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.delete(f'/api/suppliers/{self.supplier.id}/')
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "inventory_tombstone"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Tombstone.objects.filter(kind=Tombstone.KIND_PRODUCT).count(), 3)
+        self.assertFalse(SupplierStats.objects.filter(supplier_id=self.supplier.id).exists())
+
+    def test_csv_import_keeps_stats_current(self):
+        rows = [
+            {'name': f'Product {i}', 'description': 'Description', 'price': '1.00', 'supplier': name}
+            for i, name in enumerate(['Supplier A', 'Supplier A', 'Supplier C'])
+        ]
+        ProductImporter(self.user, upsert=True).run(rows)
+        product = Product.objects.get(name='Product 0')
+        Inventory.objects.create(product=product, quantity=30, user=self.user)
+        rows[0] = dict(rows[0], price='4.00')
+        ProductImporter(self.user, upsert=True).run(rows)
+
+        self.assertEqual(self.stats(self.supplier), (2, Decimal('120.00'), 0))
+        self.assertEqual(self.stats(Supplier.objects.get(name='Supplier C')), (1, Decimal('0'), 0))
+        self.assertStatsCurrent()
+
+    def test_rebuild_command_recomputes_stats(self):
+        product_id = self.create_product('3.00')
+        self.client.post('/api/inventory/', {'product': product_id, 'quantity': 4})
+        SupplierStats.objects.all().delete()
+        call_command('rebuild_supplier_stats', stdout=StringIO())
+        self.assertEqual(self.stats(self.supplier), (1, Decimal('12.00'), 1))
+        self.assertEqual(self.stats(self.other_supplier), (0, Decimal('0'), 0))
+
+    def test_stats_endpoint(self):
+        self.create_product('3.00')
+        response = self.client.get('/api/suppliers/stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['name'], 'Supplier A')
+        self.assertEqual(response.data['results'][0]['product_count'], 1)
+
+    def test_report_reads_precomputed_stats(self):
+        self.create_product('3.00')
+        with CaptureQueriesContext(connection) as queries:
+            generate_inventory_report(self.user.email)
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+        self.assertIn('Supplier A - 1 products', mail.outbox[0].body)
+
+
+class CatalogExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser23', email='test23@example.com', password='testpass123')
+        self.supplier = Supplier.objects.create(name='Test Supplier', contact_info='123-456-7890', user=self.user)
+        self.products = [
+            Product.objects.create(name=f'Product {i}', description='Description', price='1.50', supplier=self.supplier, user=self.user)
+            for i in range(5)
+        ]
+        Inventory.objects.create(product=self.products[0], quantity=7, user=self.user)
+        other_user = User.objects.create_user(username='anotheruser', email='another@example.com', password='testpass123')
+        other_supplier = Supplier.objects.create(name='Other Supplier', contact_info='', user=other_user)
+        Product.objects.create(name='Other Product', description='Description', price='1.00', supplier=other_supplier, user=other_user)
+        self.client.force_authenticate(user=self.user)
+
+    def export(self, **params):
+        response = self.client.get('/api/products/export/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return response, [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_export_streams_every_product_with_its_inventory(self):
+        _, rows = self.export()
+        self.assertEqual([row['name'] for row in rows], [f'Product {i}' for i in range(5)])
+        self.assertEqual(
+            {key: rows[0][key] for key in ('price', 'supplier', 'supplier_name', 'quantity', 'reserved')},
+            {'price': '1.50', 'supplier': self.supplier.id, 'supplier_name': 'Test Supplier', 'quantity': 7, 'reserved': 0},
+        )
+        self.assertIsNone(rows[1]['quantity'])
+
+    def test_export_reads_in_chunks(self):
+        with self.settings(EXPORT_CHUNK_SIZE=2):
+            with CaptureQueriesContext(connection) as queries:
+                _, rows = self.export()
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(sum(1 for query in queries if 'inventory_product' in query['sql']), 3)
+
+    def test_export_updated_since(self):
+        since = timezone.now()
+        Product.objects.filter(pk__in=[product.pk for product in self.products]).update(updated_at=since - timedelta(days=1))
+        Inventory.objects.update(updated_at=since - timedelta(days=1))
+        self.products[3].save()
+        self.client.post(f'/api/inventory/{self.products[0].inventory.id}/adjust/', {'delta': 1})
+
+        response, rows = self.export(updated_since=since.isoformat())
+        self.assertEqual([row['name'] for row in rows], ['Product 0', 'Product 3'])
+        self.assertGreaterEqual(parse_datetime(response['X-Export-Started-At']), since)
+
+    def test_export_rejects_invalid_updated_since(self):
+        response = self.client.get('/api/products/export/', {'updated_since': 'last week'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ValuesListTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser24', email='test24@example.com', password='testpass123')
+        self.supplier = Supplier.objects.create(name='Test Supplier', contact_info='123-456-7890', user=self.user)
+        for i, price in enumerate(['10', '0.5', '1234.99']):
+            product = Product.objects.create(name=f'Product {i}', description='Description', price=price, supplier=self.supplier, user=self.user)
+            Inventory.objects.create(product=product, quantity=i, user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def assertMatchesSerializer(self, path, serializer_class, queryset, params=None):
+        response = self.client.get(path, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = serializer_class(queryset, many=True).data
+        self.assertEqual(response.json()['results'], json.loads(json.dumps(expected)))
+
+    def test_product_list_matches_serializer(self):
+        queryset = Product.objects.filter(user=self.user).order_by('created_at', 'id')
+        self.assertMatchesSerializer('/api/products/', ProductSerializer, queryset)
+        prices = [product['price'] for product in self.client.get('/api/products/').json()['results']]
+        self.assertEqual(prices, ['10.00', '0.50', '1234.99'])
+
+    def test_supplier_and_inventory_lists_match_serializer(self):
+        self.assertMatchesSerializer('/api/suppliers/', SupplierSerializer, Supplier.objects.filter(user=self.user))
+        queryset = Inventory.objects.filter(user=self.user).order_by('created_at', 'id')
+        self.assertMatchesSerializer('/api/inventory/', InventorySerializer, queryset)
+
+    def test_cursor_pages_match_serializer(self):
+        queryset = Product.objects.filter(user=self.user).order_by('updated_at', 'id')
+        self.assertMatchesSerializer('/api/products/', ProductSerializer, queryset, {'pagination': 'cursor'})
+
+    def test_filtered_and_searched_lists(self):
+        response = self.client.get('/api/products/', {'search': 'Product 1'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['name'], 'Product 1')
+        response = self.client.get('/api/inventory/', {'quantity': 2})
+        self.assertEqual([item['quantity'] for item in response.data['results']], [2])
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser25', email='test25@example.com', password='testpass123')
+        self.supplier = Supplier.objects.create(name='Test Supplier', contact_info='123-456-7890', user=self.user)
+        self.products = [
+            Product.objects.create(name=f'Product {i}', description='Description', price='1.50', supplier=self.supplier, user=self.user)
+            for i in range(3)
+        ]
+        self.inventory = Inventory.objects.create(product=self.products[0], quantity=7, user=self.user)
+        other_user = User.objects.create_user(username='syncother', email='syncother@example.com', password='testpass123')
+        other_supplier = Supplier.objects.create(name='Other Supplier', contact_info='', user=other_user)
+        Product.objects.create(name='Other Product', description='Description', price='1.00', supplier=other_supplier, user=other_user)
+        self.client.force_authenticate(user=self.user)
+
+    def sync(self, **params):
+        response = self.client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def age(self, days=1):
+        # Move every existing row to before the next token
+        past = timezone.now() - timedelta(days=days)
+        for model in (Supplier, Product, Inventory):
+            model.objects.update(updated_at=past)
+        Tombstone.objects.update(deleted_at=past)
+
+    def test_full_sync_returns_everything(self):
+        data = self.sync()
+        self.assertEqual([product['name'] for product in data['products']], ['Product 0', 'Product 1', 'Product 2'])
+        self.assertEqual(data['products'][0], ProductSerializer(self.products[0]).data)
+        self.assertEqual(data['suppliers'], [SupplierSerializer(self.supplier).data])
+        self.assertEqual(data['inventory'], [InventorySerializer(self.inventory).data])
+        self.assertEqual(data['deleted'], {'products': [], 'suppliers': [], 'inventory': []})
+
+    def test_delta_sync_returns_changes_and_deletions(self):
+        token = self.sync()['token']
+        self.age()
+        self.client.put(f'/api/products/{self.products[1].id}/', {
+            'name': 'Renamed', 'description': 'Description', 'price': '2.00', 'supplier': self.supplier.id,
+        })
+        self.client.post(f'/api/inventory/{self.inventory.id}/adjust/', {'delta': 3})
+        self.client.delete(f'/api/products/{self.products[2].id}/')
+
+        data = self.sync(since=token)
+        self.assertEqual([product['name'] for product in data['products']], ['Renamed'])
+        self.assertEqual(data['suppliers'], [])
+        self.assertEqual([item['quantity'] for item in data['inventory']], [10])
+        self.assertEqual(data['deleted'], {'products': [self.products[2].id], 'suppliers': [], 'inventory': []})
+
+        # Nothing changed since, and the old deletion is not repeated
+        self.age()
+        self.assertEqual(self.sync(since=data['token'])['deleted']['products'], [])
+
+    def test_cascaded_deletes_leave_tombstones(self):
+        ids = (self.supplier.id, [product.id for product in self.products], self.inventory.id)
+        token = self.sync()['token']
+        self.age()
+        self.supplier.delete()
+        deleted = self.sync(since=token)['deleted']
+        self.assertEqual(deleted['suppliers'], [ids[0]])
+        self.assertEqual(sorted(deleted['products']), ids[1])
+        self.assertEqual(deleted['inventory'], [ids[2]])
+
+    def test_token_overlaps_recent_writes(self):
+        with self.settings(SYNC_TOKEN_OVERLAP=60):
+            data = self.sync()
+        self.assertLessEqual(decode_token(data['token']), timezone.now() - timedelta(seconds=59))
+        self.assertEqual(len(self.sync(since=data['token'])['products']), 3)
+
+    def test_large_syncs_are_paged(self):
+        token = self.sync()['token']
+        self.age()
+        self.products[2].delete()
+        self.products[1].delete()
+        for i in range(3):
+            Product.objects.create(name=f'New {i}', description='Description', price='1.00', supplier=self.supplier, user=self.user)
+
+        with self.settings(SYNC_PAGE_SIZE=2):
+            first = self.sync(since=token)
+            self.assertTrue(first['has_more'])
+            self.assertEqual([product['name'] for product in first['products']], ['New 0', 'New 1'])
+            self.assertEqual(len(first['deleted']['products']), 2)
+            # Written after the sync started, so left for the next one
+            Product.objects.create(name='Later', description='Description', price='1.00', supplier=self.supplier, user=self.user)
+            second = self.sync(since=first['token'])
+        self.assertFalse(second['has_more'])
+        self.assertEqual([product['name'] for product in second['products']], ['New 2'])
+        self.assertEqual(second['deleted']['products'], [])
+        self.assertTrue(second['token'].isdigit())
+
+        with self.settings(SYNC_TOKEN_OVERLAP=0):
+            names = [product['name'] for product in self.sync(since=second['token'])['products']]
+        self.assertIn('Later', names)
+
+    def test_invalid_and_expired_tokens(self):
+        response = self.client.get('/api/sync/', {'since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/sync/', {'since': 'eyJzaW5jZSI6MX0='})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(SYNC_TOMBSTONE_RETENTION_DAYS=1):
+            token = self.sync()['token']
+            response = self.client.get('/api/sync/', {'since': str(int(token) - 2 * 24 * 3600 * 10 ** 6)})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    def test_purge_expired_tombstones(self):
+        kept = self.products[2].id
+        self.products[1].delete()
+        self.age(days=40)
+        self.products[2].delete()
+        self.assertEqual(purge_expired_tombstones(), 1)
+        self.assertEqual(list(Tombstone.objects.values_list('object_id', flat=True)), [kept])
+
+    def test_deleting_user_with_tombstones(self):
+        product_id = self.products[0].id
+        self.products[1].delete()
+        self.user.delete()
+        self.assertFalse(Product.objects.filter(pk=product_id).exists())
+
+
+class ReorderLevelTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser26', email='test26@example.com', password='testpass123')
+        self.supplier = Supplier.objects.create(name='Test Supplier', contact_info='123-456-7890', user=self.user)
+        self.product = Product.objects.create(name='Widget', description='Description', price='2.00', supplier=self.supplier, reorder_level=50, user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def flags(self):
+        return dict(Inventory.objects.values_list('product_id', 'low_stock'))
+
+    def assertStatsCurrent(self):
+        computed = compute_supplier_stats([self.supplier.pk])[self.supplier.pk]
+        stats = SupplierStats.objects.get(supplier=self.supplier)
+        self.assertEqual(stats.low_stock_count, computed['low_stock_count'])
+
+    def test_reorder_level_defaults_to_ten(self):
+        response = self.client.post('/api/products/', {
+            'name': 'Gadget', 'description': 'Description', 'price': '1.00', 'supplier': self.supplier.id,
+        })
+        self.assertEqual(response.data['reorder_level'], 10)
+
+    def test_flag_follows_quantity_changes(self):
+        response = self.client.post('/api/inventory/', {'product': self.product.id, 'quantity': 40})
+        self.assertTrue(response.data['low_stock'])
+        inventory_id = response.data['id']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'/api/inventory/{inventory_id}/adjust/', {'delta': 10})
+        self.assertFalse(response.data['low_stock'])
+        updates = [query for query in queries if query['sql'].startswith('UPDATE "inventory_inventory"')]
+        self.assertEqual(len(updates), 1)
+
+        self.client.post(f'/api/inventory/{inventory_id}/adjust/', {'delta': -1})
+        self.assertEqual(self.flags(), {self.product.id: True})
+        self.client.put(f'/api/inventory/{inventory_id}/', {'product': self.product.id, 'quantity': 80})
+        self.assertEqual(self.flags(), {self.product.id: False})
+        self.assertStatsCurrent()
+
+    def test_bulk_writes_set_flag(self):
+        other = Product.objects.create(name='Gizmo', description='Description', price='1.00', supplier=self.supplier, user=self.user)
+        response = self.client.post('/api/inventory/bulk/', [
+            {'product': self.product.id, 'quantity': 20},
+            {'product': other.id, 'quantity': 20},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.flags(), {self.product.id: True, other.id: False})
+
+        ids = dict(Inventory.objects.values_list('product_id', 'id'))
+        self.client.put('/api/inventory/bulk/', [
+            {'id': ids[self.product.id], 'quantity': 60},
+            {'id': ids[other.id], 'quantity': 5},
+        ], format='json')
+        self.assertEqual(self.flags(), {self.product.id: False, other.id: True})
+        self.assertStatsCurrent()
+
+    def test_changing_reorder_level_refreshes_flag(self):
+        Inventory.objects.create(product=self.product, quantity=30, user=self.user)
+        self.assertEqual(self.flags(), {self.product.id: True})
+
+        self.client.put(f'/api/products/{self.product.id}/', {
+            'name': 'Widget', 'description': 'Description', 'price': '2.00', 'supplier': self.supplier.id, 'reorder_level': 20,
+        })
+        self.assertEqual(self.flags(), {self.product.id: False})
+        self.assertStatsCurrent()
+
+        self.client.put('/api/products/bulk/', [{'id': self.product.id, 'reorder_level': 31}], format='json')
+        self.assertEqual(self.flags(), {self.product.id: True})
+        self.assertStatsCurrent()
+
+    def test_flag_refresh_updates_only_flipped_rows(self):
+        inventory = Inventory.objects.create(product=self.product, quantity=30, user=self.user)
+        other = Product.objects.create(name='Gizmo', description='Description', price='1.00', supplier=self.supplier, user=self.user)
+        untouched = Inventory.objects.create(product=other, quantity=80, user=self.user)
+        etag = self.client.get(f'/api/inventory/{inventory.id}/')['ETag']
+
+        self.client.put('/api/products/bulk/', [
+            {'id': self.product.id, 'reorder_level': 20},
+            {'id': other.id, 'reorder_level': 20},
+        ], format='json')
+        response = self.client.get(f'/api/inventory/{inventory.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['low_stock'])
+        self.assertGreater(Inventory.objects.get(pk=inventory.pk).updated_at, inventory.updated_at)
+        self.assertEqual(Inventory.objects.get(pk=untouched.pk).updated_at, untouched.updated_at)
+
+    def test_low_stock_endpoint_lists_flagged_items(self):
+        Inventory.objects.create(product=self.product, quantity=30, reserved=5, user=self.user)
+        plenty = Product.objects.create(name='Gizmo', description='Description', price='1.00', supplier=self.supplier, user=self.user)
+        Inventory.objects.create(product=plenty, quantity=30, user=self.user)
+        scarce = Product.objects.create(name='Gadget', description='Description', price='1.00', supplier=self.supplier, user=self.user)
+        Inventory.objects.create(product=scarce, quantity=2, user=self.user)
+
+        response = self.client.get('/api/inventory/low-stock/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item['name'], item['reorder_level'], item['suggested_order']) for item in response.data['results']],
+            [('Gadget', 10, 8), ('Widget', 50, 25)],
+        )
+
+    def test_report_uses_reorder_levels(self):
+        Inventory.objects.create(product=self.product, quantity=30, user=self.user)
+        self.assertEqual([row[-1] for row in report_rows(self.user.id)], [True])
+
+
+@skipIf(connection.vendor == 'sqlite', "SQLite locks the whole database on write")
+class ConcurrentStockChangeTests(TransactionTestCase):
+    THREADS = 20
+    CHANGES_PER_THREAD = 100
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser19', email='test19@example.com', password='testpass123')
+        supplier = Supplier.objects.create(name='Test Supplier', contact_info='123-456-7890', user=self.user)
+        product = Product.objects.create(name='Test Product', description='Description', price=10.0, supplier=supplier, user=self.user)
+        self.inventory = Inventory.objects.create(product=product, quantity=50, user=self.user)
+
+    def test_concurrent_adjustments_are_not_lost(self):
+        results = []
+        lock = threading.Lock()
+
+        def worker(seed):
+            applied = 0
+            try:
+                for i in range(self.CHANGES_PER_THREAD):
+                    delta = 1 if (seed + i) % 2 else -2
+                    try:
+                        adjust_stock(Inventory.objects.all(), self.inventory.id, delta)
+                        applied += delta
+                    except InsufficientStock:
+                        pass
+            finally:
+                connection.close()
+            with lock:
+                results.append(applied)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.inventory.refresh_from_db()
+        self.assertEqual(len(results), self.THREADS)
+        self.assertEqual(self.inventory.quantity, 50 + sum(results))
+        self.assertGreaterEqual(self.inventory.quantity, 0)
+
+
+@skipUnless(connection.vendor == 'mysql', 'SQLite has no row locks')
+class ConcurrentUpsertTests(TransactionTestCase):
+    THREADS = 8
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser40', email='test40@example.com', password='testpass123')
+        Supplier.objects.create(name='Supplier X', contact_info='', user=self.user)
+
+    def test_parallel_upserts_insert_each_product_once(self):
+        rows = [
+            {'name': f'Product {i}', 'description': 'Description', 'price': '1.00', 'supplier': 'Supplier X'}
+            for i in range(50)
+        ]
+        barrier = threading.Barrier(self.THREADS)
+
+        def worker():
+            try:
+                barrier.wait()
+                ProductImporter(self.user, upsert=True).run(rows)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(Product.objects.filter(user=self.user).count(), len(rows))
+
+
+class ProductSearchTests(TransactionTestCase):
+    # InnoDB only makes rows visible to FULLTEXT searches once they are
+    # committed, so these tests cannot run inside a TestCase transaction.
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser14', email='test14@example.com', password='testpass123')
+        supplier = Supplier.objects.create(name='Test Supplier', contact_info='123-456-7890', user=self.user)
+        for name, description in [
+            ('Office Desk', 'Solid oak desk with a built in lamp socket'),
+            ('Brass Lamp', 'Reading lamp with a brass finish'),
+            ('Garden Hose', 'Twenty metre hose'),
+        ]:
+            Product.objects.create(name=name, description=description, price=10.0, supplier=supplier, user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_search_orders_by_relevance(self):
+        response = self.client.get('/api/products/?search=lamp')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['name'] for p in response.data['results']], ['Brass Lamp', 'Office Desk'])
+
+    def test_search_matches_any_word(self):
+        response = self.client.get('/api/products/?search=hose oak')
+        self.assertEqual({p['name'] for p in response.data['results']}, {'Garden Hose', 'Office Desk'})
+
+    def test_search_ignores_operators(self):
+        response = self.client.get('/api/products/?search=%2B%2B(')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [])
+
+
+class QueryPlanTests(TestCase):
+    """
+    The per-user list queries should be served by the composite indexes.
+    Run with QUERY_PLAN_ROWS=1000000 to check the plans at production size.
+    """
+    rows = int(os.environ.get('QUERY_PLAN_ROWS', 2000))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser12', email='test12@example.com', password='testpass123')
+        other = User.objects.create_user(username='testuser13', email='test13@example.com', password='testpass123')
+        for owner in (cls.user, other):
+            supplier = Supplier.objects.create(name='Supplier', contact_info='123-456-7890', user=owner)
+            for batch in chunked(range(cls.rows // 2), 5000):
+                Product.objects.bulk_create(
+                    Product(name=f'Product {i}', description='Description', price=i % 100, supplier=supplier, user=owner)
+                    for i in batch
+                )
+            products = Product.objects.filter(user=owner).values_list('id', flat=True).iterator(chunk_size=5000)
+            for batch in chunked(products, 5000):
+                Inventory.objects.bulk_create(
+                    Inventory(product_id=product_id, quantity=product_id % 50, user=owner) for product_id in batch
+                )
+        # Refresh the planner statistics after the bulk load
+        analyze = 'ANALYZE TABLE' if connection.vendor == 'mysql' else 'ANALYZE'
+        with connection.cursor() as cursor:
+            for model in (Supplier, Product, Inventory):
+                cursor.execute(f"{analyze} {connection.ops.quote_name(model._meta.db_table)}")
+
+    def assertUsesIndex(self, queryset, index_name):
+        self.assertIn(index_name, queryset.explain())
+
+    def test_product_list_is_ordered_by_index(self):
+        self.assertUsesIndex(Product.objects.filter(user=self.user).order_by('created_at', 'id'), 'product_user_created_idx')
+
+    def test_product_keyset_page(self):
+        last = Product.objects.filter(user=self.user).order_by('updated_at', 'id')[self.rows // 4]
+        queryset = Product.objects.filter(user=self.user, updated_at__gt=last.updated_at).order_by('updated_at', 'id')[:10]
+        self.assertUsesIndex(queryset, 'product_user_updated_idx')
+
+    def test_product_price_filter(self):
+        queryset = ProductFilter({'price': '10'}, queryset=Product.objects.filter(user=self.user)).qs
+        self.assertUsesIndex(queryset, 'product_user_price_idx')
+
+    def test_inventory_quantity_filter(self):
+        queryset = InventoryFilter({'quantity': '5'}, queryset=Inventory.objects.filter(user=self.user)).qs
+        self.assertUsesIndex(queryset, 'inventory_user_qty_idx')
+
+    def test_low_stock_report_query(self):
+        self.assertUsesIndex(Inventory.objects.filter(user=self.user, quantity__lt=10), 'inventory_user_qty_idx')
+
+    @skipUnless(connection.vendor == 'mysql', 'FULLTEXT indexes are MySQL only')
+    def test_product_search_uses_fulltext_index(self):
+        queryset = ProductFilter({'search': 'product'}, queryset=Product.objects.filter(user=self.user)).qs
+        self.assertUsesIndex(queryset, FULLTEXT_INDEX_NAME)
+
+    def test_upsert_natural_key_lookup(self):
+        supplier = Supplier.objects.get(user=self.user)
+        queryset = Product.objects.filter(user=self.user, supplier=supplier, name__in=['Product 1', 'Product 2'])
+        self.assertUsesIndex(queryset, 'product_user_supplier_name_idx')
+
+
+class QueryCountTests(TestCase):
+    """
+    The number of queries behind each list endpoint and the report must not
+    grow with the amount of data.
+    """
+    sizes = (10, 1000, 10000)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser22', email='test22@example.com', password='testpass123')
+        self.suppliers = [Supplier.objects.create(name=f'Supplier {i}', contact_info='', user=self.user) for i in range(5)]
+        self.client.force_authenticate(user=self.user)
+        self.seeded = 0
+        use_temporary_media_root(self)
+
+    def seed(self, rows):
+        for batch in chunked(range(self.seeded, rows), 5000):
+            Product.objects.bulk_create(
+                Product(name=f'Product {i}', description='Description', price=i % 100, supplier=self.suppliers[i % 5], user=self.user)
+                for i in batch
+            )
+        products = Product.objects.filter(user=self.user, inventory__isnull=True).values_list('id', flat=True)
+        for batch in chunked(list(products), 5000):
+            Inventory.objects.bulk_create(
+                Inventory(product_id=product_id, quantity=product_id % 20, user=self.user) for product_id in batch
+            )
+        self.seeded = rows
+        call_command('rebuild_supplier_stats', stdout=StringIO())
+        cache.clear()
+
+    def generate_report(self):
+        # The report reads one query per chunk by design, keep it to one chunk
+        with self.settings(REPORT_CHUNK_SIZE=max(self.sizes) + 1):
+            generate_inventory_report(self.user.email)
+
+    def count_queries(self):
+        at = timezone.now().isoformat()
+        checks = {
+            'products': lambda: self.client.get('/api/products/', {'page_size': 100}),
+            'products cursor': lambda: self.client.get('/api/products/', {'pagination': 'cursor'}),
+            'inventory': lambda: self.client.get('/api/inventory/', {'page_size': 100}),
+            'suppliers': lambda: self.client.get('/api/suppliers/'),
+            'supplier stats': lambda: self.client.get('/api/suppliers/stats/'),
+            'stock at': lambda: self.client.get('/api/inventory/stock-at/', {'at': at, 'page_size': 100}),
+            'report': self.generate_report,
+        }
+        counts = {}
+        for name, check in checks.items():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                check()
+            counts[name] = len(queries)
+        return counts
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.seed(self.sizes[0])
+        expected = self.count_queries()
+        for rows in self.sizes[1:]:
+            self.seed(rows)
+            with self.subTest(rows=rows):
+                self.assertEqual(self.count_queries(), expected)
@@ -1,7 +1,8 @@
 from django.urls import path
 from rest_framework.documentation import include_docs_urls
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from .views import ProductViewSet, SupplierViewSet, InventoryViewSet, RegisterView, CSVUploadView, GenerateReportView
+from . import async_views
+from .views import ProductViewSet, SupplierViewSet, InventoryViewSet, RegisterView, CSVUploadView, GenerateReportView, ImportJobViewSet, ReportViewSet, ReportLinkDownloadView, SyncView
 # from rest_framework.schemas import get_schema_view
 # from rest_framework.renderers import JSONOpenAPIRenderer
 from drf_yasg.views import get_schema_view
@@ -46,11 +47,30 @@ urlpatterns += [
     path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('login/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('products/', ProductViewSet.as_view({'get': 'list', 'post': 'create'})),
-    path('products/<int:pk>/', ProductViewSet.as_view({'put': 'update', 'delete': 'destroy'})),
+    path('products/export/', ProductViewSet.as_view({'get': 'export'}), name='product_export'),
+    path('products/bulk/', ProductViewSet.as_view({'post': 'bulk_create', 'put': 'bulk_update', 'delete': 'bulk_destroy'})),
+    path('products/<int:pk>/', ProductViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'})),
     path('suppliers/', SupplierViewSet.as_view({'get': 'list', 'post': 'create'})),
-    path('suppliers/<int:pk>/', SupplierViewSet.as_view({'put': 'update', 'delete': 'destroy'})),
+    path('suppliers/stats/', SupplierViewSet.as_view({'get': 'stats'}), name='supplier_stats'),
+    path('suppliers/<int:pk>/', SupplierViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'})),
     path('inventory/', InventoryViewSet.as_view({'get': 'list', 'post': 'create'})),
-    path('inventory/<int:pk>/', InventoryViewSet.as_view({'put': 'update', 'delete': 'destroy'})),
+    path('inventory/bulk/', InventoryViewSet.as_view({'post': 'bulk_create', 'put': 'bulk_update', 'delete': 'bulk_destroy'})),
+    path('inventory/<int:pk>/', InventoryViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'})),
+    path('inventory/low-stock/', InventoryViewSet.as_view({'get': 'low_stock'}), name='inventory_low_stock'),
+    path('inventory/stock-at/', InventoryViewSet.as_view({'get': 'stock_at'}), name='inventory_stock_at'),
+    path('inventory/<int:pk>/adjust/', InventoryViewSet.as_view({'post': 'adjust'}), name='inventory_adjust'),
+    path('inventory/<int:pk>/reserve/', InventoryViewSet.as_view({'post': 'reserve'}), name='inventory_reserve'),
+    path('inventory/<int:pk>/release/', InventoryViewSet.as_view({'post': 'release'}), name='inventory_release'),
     path('upload-csv/', CSVUploadView.as_view(), name='upload_csv'),
+    path('imports/<int:pk>/', ImportJobViewSet.as_view({'get': 'retrieve'}), name='import_job'),
     path('generate-report/', GenerateReportView.as_view(), name='generate_report'),
+    path('reports/', ReportViewSet.as_view({'get': 'list'}), name='reports'),
+    path('reports/<int:pk>/', ReportViewSet.as_view({'get': 'retrieve'}), name='report'),
+    path('reports/<int:pk>/download/', ReportViewSet.as_view({'get': 'download'}), name='report_download'),
+    path('reports/download/<str:token>/', ReportLinkDownloadView.as_view(), name='report_link_download'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('async/products/', async_views.products.list, name='async_product_list'),
+    path('async/products/<int:pk>/', async_views.products.detail, name='async_product_detail'),
+    path('async/inventory/', async_views.inventory.list, name='async_inventory_list'),
+    path('async/inventory/<int:pk>/', async_views.inventory.detail, name='async_inventory_detail'),
 ]
\ No newline at end of file
@@ -0,0 +1,97 @@
+from functools import cached_property
+
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .replica import REPLICA, read_database
+
+# Serializer fields whose output is the raw .values() value unchanged
+PASSTHROUGH_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+class ValuesRepresentation:
+    """
+    Map ``.values()`` rows to the dicts ``serializer`` would produce for the
+    same objects. The serializer's fields are inspected once; per row only
+    the values that need it (Decimal, dates, ...) go through the field's
+    ``to_representation``.
+    """
+
+    def __init__(self, serializer):
+        readable = [(name, field) for name, field in serializer.fields.items() if not field.write_only]
+        self.fields = [(name, field.source.replace('.', '__')) for name, field in readable]
+        self.converters = {
+            name: field.to_representation
+            for name, field in readable
+            if not isinstance(field, PASSTHROUGH_FIELDS)
+        }
+
+    @property
+    def lookups(self):
+        return [lookup for _, lookup in self.fields]
+
+    def __call__(self, row):
+        data = {}
+        for name, lookup in self.fields:
+            value = row[lookup]
+            if value is not None and name in self.converters:
+                value = self.converters[name](value)
+            data[name] = value
+        return data
+
+
+class ValuesListMixin:
+    """
+    Serve list actions from ``.values()`` rows instead of building a model
+    instance and running the serializer for every object. The response is
+    the same as the serializer's, at a fraction of the per-item cost.
+    """
+
+    def list(self, request, *args, **kwargs):
+        representation = ValuesRepresentation(self.get_serializer())
+        lookups = representation.lookups
+        # Cursor pagination reads its position from the ordering fields
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        lookups += [field.lstrip('-') for field in ordering if field.lstrip('-') not in lookups]
+
+        rows = self.filter_queryset(self.get_queryset()).values(*lookups)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response([representation(row) for row in page])
+        return Response([representation(row) for row in rows])
+
+
+class ReplicaListMixin:
+    """
+    Run list queries (including the conditional GET aggregate) against the
+    read replica, unless the user wrote recently.
+
+    A replica lagging longer than the sticky window can still serve a list
+    from before the user's write, so what it serves is cached for at most
+    ``REPLICA_STICKY_SECONDS``. Goes before the caching mixins.
+    """
+
+    @cached_property
+    def list_database(self):
+        # Decided once per request, so the list and its state agree
+        return read_database(self.request.user.pk)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list':
+            queryset = queryset.using(self.list_database)
+        return queryset
+
+    def list_cache_timeout(self):
+        timeout = super().list_cache_timeout()
+        if self.list_database == REPLICA:
+            return min(timeout, settings.REPLICA_STICKY_SECONDS)
+        return timeout
@@ -1,25 +1,62 @@
-import csv
-from io import StringIO
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .models import Product, Supplier, Inventory
+from .models import Product, Supplier, Inventory, ImportJob, Report, StockMovement, SupplierStats
 from django_filters import rest_framework as filters
-from .filters import CustomPagination,  ProductFilter , SupplierFilter, InventoryFilter
+from .filters import CustomPagination, CustomCursorPagination, ProductFilter, SupplierFilter, InventoryFilter
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import HttpResponseRedirect, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.contrib.auth.models import User
 from django.contrib.auth.hashers import make_password
-from .serializers import ProductSerializer, SupplierSerializer, InventorySerializer
-from .tasks import process_csv, generate_inventory_report
+from .serializers import ProductSerializer, SupplierSerializer, InventorySerializer, ImportJobSerializer, ReportSerializer
+from .serializers import ProductBulkSerializer, InventoryBulkSerializer, check_reserved
+from .serializers import StockAdjustmentSerializer, StockReservationSerializer, SupplierStatsSerializer, LowStockSerializer
+from .stock import InsufficientStock, adjust_stock, release_stock, reserve_stock
+from .ledger import record_movements, stock_levels_at
+from .reorder import refresh_low_stock
+from .stats import StatsDelta
+from .reports import CONTENT_TYPES, report_for_token, stream_report
+from .exports import catalog_rows, ndjson_lines
+from .sync import ExpiredToken, InvalidToken, changes_since, read_token
+from .tasks import process_csv_file, process_csv_sharded, generate_inventory_report
+from .importers import REQUIRED_COLUMNS, read_csv_header, save_upload
+from .cache import CachedListMixin, invalidate_user_cache
+from .conditional import ConditionalGetMixin
+from .bulk import BulkMixin
+from .signals import batched_deletes
+from .values import ReplicaListMixin, ValuesListMixin
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from rest_framework.parsers import MultiPartParser, FormParser
+import logging
 
+logger = logging.getLogger(__name__)
 
 
 
 
 
 
+
+def parse_timestamp(value):
+    """
+    Parse an ISO 8601 datetime query parameter, assuming the current time
+    zone when it has none. Returns None if the value is not a datetime.
+    """
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        return None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
 # Django’s built-in User model and DRF’s TokenObtainPairView for JWT authentication.
 class RegisterView(APIView):
     """
@@ -63,15 +100,34 @@ class RegisterView(APIView):
         )
         return Response({"message": "User registered successfully"}, status=status.HTTP_201_CREATED)
 
-class ProductViewSet(viewsets.ModelViewSet):
+class PaginationModeMixin:
+    """
+    Use page number pagination by default and keyset pagination when the
+    request asks for it with ?pagination=cursor (or follows a cursor link).
+    """
+    cursor_pagination_class = CustomCursorPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if params.get('pagination') == 'cursor' or 'cursor' in params:
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
+
+
+class ProductViewSet(BulkMixin, ReplicaListMixin, ConditionalGetMixin, CachedListMixin, ValuesListMixin, PaginationModeMixin, viewsets.ModelViewSet):
     serializer_class = ProductSerializer
+    bulk_serializer_class = ProductBulkSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = CustomPagination # Add custom pagination
     filter_backends = [filters.DjangoFilterBackend]  # Add filter backend
     filterset_class = ProductFilter  # Add filterset
 
     def get_queryset(self):
-        return Product.objects.filter(user=self.request.user)
+        return Product.objects.filter(user=self.request.user).order_by('created_at', 'id')
     
     # @swagger_auto_schema(
     #     request_body=openapi.Schema(
@@ -91,8 +147,61 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+        invalidate_user_cache(self.request.user.pk)
+
+    def perform_destroy(self, instance):
+        # Cascades to the product's inventory
+        with batched_deletes():
+            super().perform_destroy(instance)
 
-class SupplierViewSet(viewsets.ModelViewSet):
+    def export(self, request):
+        """
+        Stream the user's whole catalog (products with their inventory) as
+        newline delimited JSON. ``?updated_since=<ISO 8601 datetime>`` limits
+        it to products whose product or inventory row changed since then.
+        """
+        updated_since = None
+        if 'updated_since' in request.query_params:
+            updated_since = parse_timestamp(request.query_params['updated_since'])
+            if updated_since is None:
+                return Response({"error": "'updated_since' must be an ISO 8601 datetime"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Passing this back as updated_since picks up every later change
+        started_at = timezone.now()
+        rows = catalog_rows(request.user, updated_since)
+        response = StreamingHttpResponse(ndjson_lines(rows, settings.EXPORT_CHUNK_SIZE), content_type='application/x-ndjson')
+        response['X-Export-Started-At'] = started_at.isoformat()
+        return response
+
+    def perform_bulk_create(self, objects):
+        super().perform_bulk_create(objects)
+        stats = StatsDelta()
+        for obj in objects:
+            stats.add_products(obj.supplier_id, 1)
+        stats.apply()
+
+    def perform_bulk_update(self, objects, fields):
+        if not {'price', 'supplier_id', 'reorder_level'} & set(fields):
+            super().perform_bulk_update(objects, fields)
+            return
+        ids = [obj.pk for obj in objects]
+        previous = {pk: values for pk, *values in Product.objects.filter(pk__in=ids).values_list('pk', 'supplier_id', 'price', 'reorder_level')}
+        quantities = dict(Inventory.objects.filter(product_id__in=ids).values_list('product_id', 'quantity'))
+        super().perform_bulk_update(objects, fields)
+        if 'reorder_level' in fields:
+            refresh_low_stock(Inventory.objects.filter(product_id__in=ids))
+
+        stats = StatsDelta()
+        for obj in objects:
+            supplier_id, price, reorder_level = previous[obj.pk]
+            stats.add_products(supplier_id, -1)
+            stats.add_products(obj.supplier_id, 1)
+            if obj.pk in quantities:
+                stats.add_stock(supplier_id, price, reorder_level, quantities[obj.pk], sign=-1)
+                stats.add_stock(obj.supplier_id, obj.price, obj.reorder_level if 'reorder_level' in fields else reorder_level, quantities[obj.pk])
+        stats.apply()
+
+class SupplierViewSet(ReplicaListMixin, ConditionalGetMixin, CachedListMixin, ValuesListMixin, PaginationModeMixin, viewsets.ModelViewSet):
     serializer_class = SupplierSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = CustomPagination # Add custom pagination
@@ -100,7 +209,7 @@ class SupplierViewSet(viewsets.ModelViewSet):
     filterset_class = SupplierFilter  # Add filterset
 
     def get_queryset(self):
-        return Supplier.objects.filter(user=self.request.user)
+        return Supplier.objects.filter(user=self.request.user).order_by('created_at', 'id')
     
     # @swagger_auto_schema(
     #     request_body=openapi.Schema(
@@ -117,16 +226,34 @@ class SupplierViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+        invalidate_user_cache(self.request.user.pk)
 
-class InventoryViewSet(viewsets.ModelViewSet):
+    def perform_destroy(self, instance):
+        # Cascades to every product of the supplier and their inventory
+        with batched_deletes():
+            super().perform_destroy(instance)
+
+    def stats(self, request):
+        """
+        Precomputed product count, stock value and low stock count of each of
+        the user's suppliers.
+        """
+        queryset = SupplierStats.objects.filter(supplier__user=request.user).select_related('supplier').order_by('supplier_id')
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(SupplierStatsSerializer(page, many=True).data)
+        return Response(SupplierStatsSerializer(queryset, many=True).data)
+
+class InventoryViewSet(BulkMixin, ReplicaListMixin, ConditionalGetMixin, CachedListMixin, ValuesListMixin, PaginationModeMixin, viewsets.ModelViewSet):
     serializer_class = InventorySerializer
+    bulk_serializer_class = InventoryBulkSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = CustomPagination # Add custom pagination
     filter_backends = [filters.DjangoFilterBackend]  # Add filter backend
     filterset_class = InventoryFilter  # Add filterset
 
     def get_queryset(self):
-        return Inventory.objects.filter(user=self.request.user)
+        return Inventory.objects.filter(user=self.request.user).order_by('created_at', 'id')
     
     # @swagger_auto_schema(
     #     request_body=openapi.Schema(
@@ -142,7 +269,114 @@ class InventoryViewSet(viewsets.ModelViewSet):
     #     return super().create(request, *args, **kwargs)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            inventory = serializer.save(user=self.request.user)
+            record_movements([(inventory.pk, inventory.quantity)], StockMovement.REASON_CREATE)
+        invalidate_user_cache(self.request.user.pk)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            # Lock the row so the recorded delta matches what the update replaced
+            previous, reserved = Inventory.objects.select_for_update().values_list('quantity', 'reserved').get(pk=serializer.instance.pk)
+            # Save the current reservations, not the ones read before the lock
+            serializer.instance.reserved = reserved
+            check_reserved(serializer.validated_data.get('quantity', previous), reserved)
+            super().perform_update(serializer)
+            record_movements([(serializer.instance.pk, serializer.instance.quantity - previous)], StockMovement.REASON_UPDATE)
+
+    def perform_bulk_create(self, objects):
+        super().perform_bulk_create(objects)
+        # MySQL does not return primary keys from bulk_create, so look them up
+        # by product (one inventory per product)
+        quantities = {obj.product_id: obj.quantity for obj in objects}
+        ids = Inventory.objects.filter(product_id__in=quantities).values_list('product_id', 'pk')
+        record_movements(((pk, quantities[product_id]) for product_id, pk in ids), StockMovement.REASON_CREATE)
+        refresh_low_stock(Inventory.objects.filter(product_id__in=quantities))
+        stats = StatsDelta()
+        stats.add_inventory((obj.product_id, obj.quantity, 1) for obj in objects)
+        stats.apply()
+
+    def perform_bulk_update(self, objects, fields):
+        locked = Inventory.objects.select_for_update().filter(pk__in=[obj.pk for obj in objects])
+        rows = list(locked.values_list('pk', 'product_id', 'quantity', 'reserved'))
+        previous = {pk: (product_id, quantity) for pk, product_id, quantity, _ in rows}
+        if 'quantity' in fields:
+            reserved = {pk: reserved for pk, _, _, reserved in rows}
+            for obj in objects:
+                check_reserved(obj.quantity, reserved[obj.pk])
+        super().perform_bulk_update(objects, fields)
+        # Fields left out of the update keep their locked values, not the
+        # possibly stale ones loaded during validation
+        current = {
+            obj.pk: (
+                obj.product_id if 'product_id' in fields else previous[obj.pk][0],
+                obj.quantity if 'quantity' in fields else previous[obj.pk][1],
+            )
+            for obj in objects
+        }
+        record_movements(((pk, current[pk][1] - previous[pk][1]) for pk in current), StockMovement.REASON_UPDATE)
+        refresh_low_stock(Inventory.objects.filter(pk__in=list(current)))
+        stats = StatsDelta()
+        stats.add_inventory([(*previous[pk], -1) for pk in current] + [(*current[pk], 1) for pk in current])
+        stats.apply()
+
+    def low_stock(self, request):
+        """
+        The user's inventory below its product's reorder level, lowest first,
+        with the quantity to order to get back above it.
+        """
+        queryset = self.get_queryset().filter(low_stock=True).select_related('product').order_by('quantity', 'id')
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(LowStockSerializer(page, many=True).data)
+        return Response(LowStockSerializer(queryset, many=True).data)
+
+    def stock_at(self, request):
+        """
+        Quantities of the user's inventory as they were at ``?at=<ISO 8601 datetime>``.
+        """
+        at = parse_timestamp(request.query_params.get('at', ''))
+        if at is None:
+            return Response({"error": "'at' must be an ISO 8601 datetime"}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.get_queryset().filter(created_at__lte=at)
+        page = self.paginate_queryset(queryset)
+        inventories = page if page is not None else list(queryset)
+        levels = stock_levels_at(Inventory.objects.filter(pk__in=[inventory.pk for inventory in inventories]), at)
+        data = [
+            {'id': inventory.pk, 'product': inventory.product_id, 'quantity': levels.get(inventory.pk, 0)}
+            for inventory in inventories
+        ]
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    # Stock changes are applied server-side in a single conditional UPDATE, so
+    # concurrent clients never need to read-modify-write the quantity.
+    def adjust(self, request, pk=None):
+        serializer = StockAdjustmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self.change_stock(adjust_stock, pk, serializer.validated_data['delta'])
+
+    def reserve(self, request, pk=None):
+        serializer = StockReservationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self.change_stock(reserve_stock, pk, serializer.validated_data['quantity'])
+
+    def release(self, request, pk=None):
+        serializer = StockReservationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self.change_stock(release_stock, pk, serializer.validated_data['quantity'])
+
+    def change_stock(self, operation, pk, amount):
+        try:
+            data = operation(Inventory.objects.filter(user=self.request.user), pk, amount)
+        except Inventory.DoesNotExist:
+            return Response({"error": "Inventory not found"}, status=status.HTTP_404_NOT_FOUND)
+        except InsufficientStock:
+            return Response({"error": "Insufficient stock"}, status=status.HTTP_409_CONFLICT)
+        invalidate_user_cache(self.request.user.pk)
+        return Response(data, status=status.HTTP_200_OK)
 
 
 class CSVUploadView(APIView):
@@ -159,13 +393,22 @@ class CSVUploadView(APIView):
                 required=True,
                 description="CSV file to upload."
             ),
+            openapi.Parameter(
+                name='mode',
+                in_=openapi.IN_FORM,
+                type=openapi.TYPE_STRING,
+                enum=['create', 'upsert'],
+                required=False,
+                description="'create' (default) inserts every row, 'upsert' updates existing products with the same supplier and name."
+            ),
         ],
         responses={
             202: openapi.Response(
                 description="CSV upload is being processed. You will receive an email with the results.",
                 examples={
                     "application/json": {
-                        "message": "CSV upload is being processed. You will receive an email with the results."
+                        "message": "CSV upload is being processed. You will receive an email with the results.",
+                        "job_id": 1
                     }
                 }
             ),
@@ -188,12 +431,11 @@ class CSVUploadView(APIView):
         if not file.name.endswith('.csv'):
             return Response({"error": "File must be a CSV"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Read and validate CSV content
+        # Validate the header without reading the whole file into memory
         try:
-            file_data = file.read().decode('utf-8')
-            reader = csv.DictReader(StringIO(file_data))
-            required_columns = {'name', 'description', 'price', 'supplier'}
-            if not required_columns.issubset(reader.fieldnames):
+            fieldnames = read_csv_header(file)
+            required_columns = set(REQUIRED_COLUMNS)
+            if not required_columns.issubset(fieldnames):
                 return Response(
                     {"error": f"CSV must contain the following columns: {', '.join(required_columns)}"},
                     status=status.HTTP_400_BAD_REQUEST
@@ -201,18 +443,137 @@ class CSVUploadView(APIView):
         except Exception as e:
             return Response({"error": f"Invalid CSV file: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Process the CSV file asynchronously
-        process_csv.delay(file_data, request.user.email)
+        # "create" always inserts new products, "upsert" updates the products
+        # that already exist for the same supplier and name
+        mode = request.data.get('mode', ImportJob.MODE_CREATE)
+        if mode not in dict(ImportJob.MODE_CHOICES):
+            return Response({"error": "Mode must be 'create' or 'upsert'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Spool the file to storage and process it asynchronously, splitting
+        # large files across workers
+        file_name, row_count = save_upload(file)
+        job = ImportJob.objects.create(user=request.user, file_name=file.name, mode=mode, rows_total=row_count)
+        if file.size >= settings.CSV_IMPORT_SHARD_THRESHOLD:
+            process_csv_sharded.delay(file_name, request.user.email, job.id, mode)
+        else:
+            process_csv_file.delay(file_name, request.user.email, job.id, mode)
         return Response(
-            {"message": "CSV upload is being processed. You will receive an email with the results."},
+            {
+                "message": "CSV upload is being processed. You will receive an email with the results.",
+                "job_id": job.id,
+            },
             status=status.HTTP_202_ACCEPTED
         )
 
     
 
+class ImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Progress of a CSV import. Only reads the import job row, so it is cheap
+    enough to poll while the import is running.
+    """
+    serializer_class = ImportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return ImportJob.objects.filter(user=self.request.user)
+
+
 class GenerateReportView(APIView):
     permission_classes = [permissions.IsAuthenticated]
-    
+
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'format': openapi.Schema(type=openapi.TYPE_STRING, enum=['csv', 'xlsx'], description="Export format, 'csv' by default"),
+            },
+        )
+    )
     def post(self, request):
-        generate_inventory_report.delay(request.user.email)
-        return Response({"message": "Report generation started. You will receive an email with the report."}, status=status.HTTP_202_ACCEPTED)
\ No newline at end of file
+        report_format = request.data.get('format', Report.FORMAT_CSV)
+        if report_format not in dict(Report.FORMAT_CHOICES):
+            return Response({"error": "Format must be 'csv' or 'xlsx'"}, status=status.HTTP_400_BAD_REQUEST)
+        report = Report.objects.create(user=request.user, format=report_format)
+        generate_inventory_report.delay(request.user.email, report.id)
+        return Response(
+            {
+                "message": "Report generation started. You will receive an email with the report.",
+                "report_id": report.id,
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+class ReportViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Status of the user's inventory reports, and the exported files.
+    """
+    serializer_class = ReportSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Report.objects.filter(user=self.request.user).order_by('-created_at', '-id')
+
+    def download(self, request, pk=None):
+        return report_file_response(self.get_object())
+
+
+def report_file_response(report):
+    if report.status != Report.STATUS_COMPLETED:
+        return Response({"error": "Report is not ready"}, status=status.HTTP_409_CONFLICT)
+    if not default_storage.exists(report.file_name):
+        # The worker wrote it to storage this service can't see, see MEDIA_ROOT
+        logger.error(f"Report {report.pk} file {report.file_name} is missing from storage")
+        return Response({"error": "Report file not found"}, status=status.HTTP_404_NOT_FOUND)
+    disposition = f'attachment; filename="{report.download_name}"'
+    if settings.REPORT_DOWNLOAD_REDIRECT:
+        # Send the client to the bucket with a short lived signed URL
+        return HttpResponseRedirect(default_storage.url(report.file_name, parameters={'ResponseContentDisposition': disposition}))
+    # Stream the file from storage instead of loading it into memory
+    response = StreamingHttpResponse(stream_report(report), content_type=CONTENT_TYPES[report.format])
+    response['Content-Disposition'] = disposition
+    return response
+
+
+class ReportLinkDownloadView(APIView):
+    """
+    Download a report through the signed link in its email. The link is the
+    credential, so no token is needed.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, token):
+        try:
+            report = report_for_token(token)
+        except signing.SignatureExpired:
+            return Response({"error": "Download link expired"}, status=status.HTTP_410_GONE)
+        except (signing.BadSignature, Report.DoesNotExist):
+            return Response({"error": "Invalid download link"}, status=status.HTTP_404_NOT_FOUND)
+        return report_file_response(report)
+
+
+class SyncView(APIView):
+    """
+    Products, suppliers and inventory changed since a sync token, and the
+    ids of those deleted. Each response carries the token for the next call;
+    omit ``since`` for a full sync. Large syncs come in pages: while
+    ``has_more`` is true, call again with the returned token.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('since', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Token returned by the previous sync'),
+        ]
+    )
+    def get(self, request):
+        since = request.query_params.get('since')
+        try:
+            data = changes_since(request.user, *read_token(since))
+        except InvalidToken:
+            return Response({"error": "Invalid sync token"}, status=status.HTTP_400_BAD_REQUEST)
+        except ExpiredToken:
+            return Response({"error": "Sync token expired, sync again without 'since'"}, status=status.HTTP_410_GONE)
+        return Response(data)
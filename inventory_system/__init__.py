@@ -0,0 +1,5 @@
+# Load the Celery app with Django, so tasks queued by the web process use its
+# broker and routes and not Celery's defaults
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
@@ -14,3 +14,11 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventory_system.settings')
 
 application = get_asgi_application()
+
+# Under ASGI every request runs its queries in a new thread, so a connection
+# could never be reused by the next request: close it after each one. Only
+# the web process loads this module, Celery workers keep DB_CONN_MAX_AGE.
+from django.conf import settings  # noqa: E402
+
+for database in settings.DATABASES.values():
+    database['CONN_MAX_AGE'] = 0
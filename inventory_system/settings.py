@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
+from celery.schedules import crontab
 from dotenv import load_dotenv
 import os
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -18,6 +19,17 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv()
 
 
+def env_flag(name, default):
+    """
+    Read a boolean environment variable. true/1/yes/on (any case) are True,
+    anything else is False, and an unset or empty variable is ``default``.
+    """
+    value = os.environ.get(name, '').strip()
+    if not value:
+        return default
+    return value.lower() in ('true', '1', 'yes', 'on')
+
+
 # print("os.environ.get('CELERY_BROKER_URL')", os.getenv('CELERY_BROKER_URL'))
 # print("os.environ.get('DJANGO_SECRET_KEY')", os.environ.get('DJANGO_SECRET_KEY'))
 # print("os.environ.get('DB_NAME')", os.environ.get('DB_NAME'))
@@ -78,7 +90,7 @@ ROOT_URLCONF = 'inventory_system.urls'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'inventory.authentication.ClaimsJWTAuthentication',
     ],
 
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
@@ -132,6 +144,12 @@ WSGI_APPLICATION = 'inventory_system.wsgi.application'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
 
+# Keep each worker's database connection open between requests (and Celery
+# tasks) for this many seconds instead of paying a new TLS handshake every
+# time; a reused connection is pinged before its first query. The ASGI web
+# process closes them after each request instead, see asgi.py.
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+
 if os.environ.get('DB_NAME') is not None:
     print("True", os.environ.get('DB_NAME'))
     DATABASES = {
@@ -142,6 +160,8 @@ if os.environ.get('DB_NAME') is not None:
             'PASSWORD': os.environ.get('DB_PASSWORD'),
             'HOST': os.environ.get('DB_HOST'),
             'PORT': os.environ.get('DB_PORT'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
             'OPTIONS': {
                 'ssl': {
                     'ca': '/etc/secrets/ca.pem',
@@ -168,9 +188,59 @@ else:
             'PASSWORD': 'password',
             'HOST': 'db',
             'PORT': 3306,
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
         },
     }
 
+# Optional read replica of the default database. List endpoints, exports and
+# reports read from it, except for users who wrote in the last
+# REPLICA_STICKY_SECONDS (tracked in the cache, so use Redis when the web and
+# Celery processes must agree). Everything else uses the primary.
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ.get('DB_REPLICA_HOST'),
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'USER': os.environ.get('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.environ.get('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['inventory.replica.PrimaryReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Use Redis when CACHE_REDIS_URL is set. The local-memory fallback is per
+# process, so invalidations from the Celery worker only reach the web
+# processes through a shared cache like Redis.
+
+if os.environ.get('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('CACHE_REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds a user's active flag is cached for token authentication. Saving
+# or deleting the user clears it right away.
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get('AUTH_USER_CACHE_TIMEOUT', 60))
+
+# Seconds a cached list response is kept. Writes invalidate it sooner.
+LIST_CACHE_TIMEOUT = int(os.environ.get('LIST_CACHE_TIMEOUT', 300))
+
+# Maximum number of items accepted by one request to the bulk endpoints
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 1000))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -210,6 +280,58 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles') 
 
+# Uploaded files. The web service spools CSV uploads under CSV_IMPORT_DIR for
+# the Celery worker, and the worker writes reports the web service serves, so
+# both must use the same storage. With AWS_STORAGE_BUCKET_NAME set, files are
+# kept in that S3 bucket (AWS_S3_ENDPOINT_URL for other S3 compatible stores),
+# as on Render, where the services share no disk. Otherwise they go to
+# MEDIA_ROOT, which must then be shared with the worker (docker-compose mounts
+# the same directory in both containers).
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+AWS_STORAGE_BUCKET_NAME = os.environ.get('AWS_STORAGE_BUCKET_NAME')
+if AWS_STORAGE_BUCKET_NAME:
+    DEFAULT_FILE_STORAGE = 'storages.backends.s3.S3Storage'
+    AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
+    AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
+    AWS_S3_REGION_NAME = os.environ.get('AWS_S3_REGION_NAME')
+    AWS_S3_ENDPOINT_URL = os.environ.get('AWS_S3_ENDPOINT_URL')
+    AWS_LOCATION = os.environ.get('AWS_LOCATION', '')
+    # Files stay private, both services read them through the storage API
+    AWS_DEFAULT_ACL = None
+    AWS_S3_FILE_OVERWRITE = False
+# Report downloads redirect to a signed bucket URL instead of streaming the
+# file through the web service
+REPORT_DOWNLOAD_REDIRECT = bool(AWS_STORAGE_BUCKET_NAME)
+CSV_IMPORT_DIR = 'imports'
+# Uploads of at least CSV_IMPORT_SHARD_THRESHOLD bytes are split into shards
+# of CSV_IMPORT_SHARD_ROWS rows and imported by parallel Celery tasks.
+CSV_IMPORT_SHARD_THRESHOLD = int(os.environ.get('CSV_IMPORT_SHARD_THRESHOLD', 10 * 1024 * 1024))
+CSV_IMPORT_SHARD_ROWS = int(os.environ.get('CSV_IMPORT_SHARD_ROWS', 50000))
+
+# Inventory reports are exported to REPORT_DIR in storage, reading
+# REPORT_CHUNK_SIZE rows from the database at a time. Files up to
+# REPORT_ATTACHMENT_MAX_SIZE bytes are also attached to the report email.
+REPORT_DIR = 'reports'
+REPORT_CHUNK_SIZE = int(os.environ.get('REPORT_CHUNK_SIZE', 2000))
+REPORT_ATTACHMENT_MAX_SIZE = int(os.environ.get('REPORT_ATTACHMENT_MAX_SIZE', 5 * 1024 * 1024))
+REPORT_EMAIL_LOW_STOCK_ITEMS = 50
+# Reports and their files are deleted this long after they were requested
+REPORT_RETENTION_DAYS = int(os.environ.get('REPORT_RETENTION_DAYS', 7))
+# Seconds the download link in a report email stays valid, at most as long
+# as the report is kept
+REPORT_LINK_MAX_AGE = int(os.environ.get('REPORT_LINK_MAX_AGE', REPORT_RETENTION_DAYS * 24 * 60 * 60))
+# Rows read per query by the streaming catalog export
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+# Sync tokens lag behind the sync time by this many seconds, so rows from
+# transactions still open during a sync are sent again next time
+SYNC_TOKEN_OVERLAP = int(os.environ.get('SYNC_TOKEN_OVERLAP', 5))
+# Rows of each kind sent per sync response, more follow with has_more
+SYNC_PAGE_SIZE = int(os.environ.get('SYNC_PAGE_SIZE', 1000))
+# Deletions are remembered this long; older sync tokens need a full resync
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+# Public base URL of the API, used for links in emails
+SITE_URL = os.environ.get('SITE_URL', 'http://localhost:8000')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -221,6 +343,41 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Imports and reports get their own queues and workers (see
+# celery-entrypoint.sh), so a long CSV import can't take every process a
+# report needs. Everything else stays on the default "celery" queue.
+CELERY_TASK_DEFAULT_QUEUE = 'celery'
+CELERY_TASK_ROUTES = {
+    'inventory.tasks.process_csv': {'queue': 'imports'},
+    'inventory.tasks.process_csv_file': {'queue': 'imports'},
+    'inventory.tasks.process_csv_sharded': {'queue': 'imports'},
+    'inventory.tasks.import_csv_shard': {'queue': 'imports'},
+    'inventory.tasks.finish_csv_import': {'queue': 'imports'},
+    'inventory.tasks.generate_inventory_report': {'queue': 'reports'},
+}
+# Tasks are long, so a worker process only reserves the task it is about to
+# run and the rest stay in the queue for idle workers. Acknowledging after
+# the task means a worker that dies mid report doesn't lose it.
+CELERY_WORKER_PREFETCH_MULTIPLIER = int(os.environ.get('CELERY_WORKER_PREFETCH_MULTIPLIER', 1))
+CELERY_TASK_ACKS_LATE = env_flag('CELERY_TASK_ACKS_LATE', True)
+# Processes per worker, the CPU count when unset
+CELERY_WORKER_CONCURRENCY = int(os.environ['CELERY_WORKER_CONCURRENCY']) if os.environ.get('CELERY_WORKER_CONCURRENCY') else None
+CELERY_WORKER_MAX_TASKS_PER_CHILD = int(os.environ.get('CELERY_WORKER_MAX_TASKS_PER_CHILD', 100))
+CELERY_BEAT_SCHEDULE = {
+    # Roll yesterday's stock movements into daily snapshots
+    'compact-stock-movements': {
+        'task': 'inventory.tasks.compact_stock_movements',
+        'schedule': crontab(hour=0, minute=15),
+    },
+    'purge-expired-tombstones': {
+        'task': 'inventory.tasks.purge_expired_tombstones',
+        'schedule': crontab(hour=0, minute=45),
+    },
+    'purge-expired-reports': {
+        'task': 'inventory.tasks.purge_expired_reports',
+        'schedule': crontab(hour=1, minute=15),
+    },
+}
 
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
@@ -228,6 +385,6 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.environ.get('EMAIL_HOST')
 EMAIL_PORT = os.environ.get('EMAIL_PORT')
-EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS')
+EMAIL_USE_TLS = env_flag('EMAIL_USE_TLS', False)
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')